@@ -1,16 +1,26 @@
 from applications import app, db, User
 from applications.models import *
-from faker import Faker # type: ignore
-import random
+from applications.allocator import allocator
+from applications.search import init_search_index
+from tools.seed import seed_command, seed_database, SCALES
+from tools.settlement import recompute_costs_command
+from flask.cli import with_appcontext
+import click
 import os
-from datetime import datetime, timedelta
+import threading
 
 def create_admin():
+    """
+    Create missing tables, the admin account and the search index, and backfill the availability
+    counters. Needs the current schema, so it runs from `flask init-db` / `python app.py` and
+    never on import, where it would break `flask db upgrade` on an older database.
+    """
     with app.app_context():
         instance_path = os.path.join(os.path.dirname(__file__), 'instance')
         os.makedirs(instance_path, exist_ok=True)
         
         db.create_all()
+        init_search_index()
         if not User.query.filter_by(admin=True).first():
             user = User(
                 name="Admin",
@@ -21,74 +31,46 @@ def create_admin():
             )
             db.session.add(user)
             db.session.commit()
-
-create_admin()
-
-fake = Faker()
-
-def seed_dummy_data(num_users=5, num_locations=5, lots_per_location=2, spots_per_lot=10):
-    for _ in range(num_users):
-        name = fake.name()
-        username = fake.user_name()
-        email = fake.unique.email()
-        user = User(name=name, username=username, email=email, password="1234")
-        db.session.add(user)
-
-    db.session.commit()
-
-    # Add Dummy Locations, Lots, Spots
-    all_spots = []
-    for _ in range(num_locations):
-        location_name = fake.street_name()
-        city = fake.city()
-        lat = fake.latitude()
-        lon = fake.longitude()
-
-        location = Location(name=location_name, city=city, latitude=lat, longitude=lon)
-        db.session.add(location)
-        db.session.commit()
-
-        for _ in range(lots_per_location):
-            prime_location_name = fake.company()
-            price = round(random.uniform(10, 50), 2)
-            address = fake.address()
-            pin_code = fake.postcode()[:6]
-            number_of_spots = spots_per_lot
-
-            lot = ParkingLot(prime_location_name, price, address, pin_code, number_of_spots)
-            lot.location_id = location.id
-            db.session.add(lot)
-            db.session.commit()
-
-            for _ in range(spots_per_lot):
-                spot = ParkingSpot(lot_id=lot.id, is_available=True)
-                db.session.add(spot)
-                db.session.commit()
-                all_spots.append(spot)
-
-    users = User.query.filter_by(admin=False).all()
-    for _ in range(min(20, len(all_spots))):
-        user = random.choice(users)
-        spot = random.choice(all_spots)
-        park_time = datetime.now() - timedelta(hours=random.randint(1, 24))
-
-        reservation = ReservedParking(user_id=user.id, spot_id=spot.id, park_time=park_time, exit_time=None, total_cost=None)
-        db.session.add(reservation)
-
-    db.session.commit()
-    print("✅ Dummy data seeded successfully.")
-
-# Run dummy seeder only if there are 1 or fewer users (i.e. just the admin)
-with app.app_context():
-    user_count = User.query.count()
-    if user_count <= 1:
-        print("🔁 Seeding dummy data...")
-        seed_dummy_data()
-    else:
-        pass
+        # Backfill / repair the per-lot availability counters
+        recount_available_spots()
+        # Load the free-spot heaps used by /reserve_in_lot
+        allocator.rebuild()
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create missing tables and the admin account, then repair the availability counters."""
+    create_admin()
+    click.echo("✅ Database initialised.")
+
+_worker_ready = False
+_worker_lock = threading.Lock()
+
+@app.before_request
+def init_worker():
+    # FTS detection is per process (applications.search.fts_enabled); free-spot heaps load lazily.
+    # Deferred to the first request so CLI commands such as `flask db upgrade` never touch the schema.
+    global _worker_ready
+    if _worker_ready:
+        return
+    with _worker_lock:
+        if not _worker_ready:
+            init_search_index()
+            _worker_ready = True
+
+app.cli.add_command(init_db_command)
+# Dummy data is loaded on demand with `flask seed` (see tools/seed.py), never on import
+app.cli.add_command(seed_command)
+app.cli.add_command(recompute_costs_command)
 
 if __name__ == "__main__":
     #print(app.url_map)
+    # Local dev server: start with the small demo dataset if there is only the admin
+    create_admin()
+    with app.app_context():
+        if User.query.count() <= 1:
+            print("🔁 Seeding dummy data...")
+            seed_database(**SCALES["small"])
     app.run(debug=True)
 
 from applications import celery
\ No newline at end of file
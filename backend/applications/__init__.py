@@ -1,15 +1,19 @@
-from flask_bcrypt import Bcrypt
 from flask import Flask
 from flask_cors import CORS
 from applications.models import db, User
+from applications.cache_utils import cache
+from applications.json_provider import init_json_provider
+from applications.live import init_live
+from applications.outbox import init_outbox
+from applications.passwords import init_passwords
 from config import Config
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 from tools import workers
 from tools.mail_bot import init_app, send_email
 import os
+import sqlite3
 
-bcrypt = Bcrypt()
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate   # <-- ADD THIS
 
@@ -18,9 +22,13 @@ template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'te
 # Initialize Flask app, explicitly telling it where the templates are
 app = Flask(__name__, template_folder=template_dir)
 app.config.from_object(Config)
+init_json_provider(app)
 
 db.init_app(app)
-bcrypt.init_app(app)
+init_passwords(app)
+cache.init_app(app)
+init_live(app)
+init_outbox(app)
 jwt = JWTManager(app)
 
 # Enable Flask-Migrate
@@ -36,11 +44,14 @@ celery.conf.update(
 
 celery.Task = workers.ContextTask
 
-# Enable FK constraints in SQLite
+# Apply the storage profile (FK constraints, WAL, busy timeout, ...) to every SQLite connection
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
     cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
+    for pragma, value in app.config["SQLITE_PRAGMAS"].items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
     cursor.close()
 
 CORS(app, supports_credentials=True)
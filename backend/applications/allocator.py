@@ -0,0 +1,104 @@
+from applications.models import db, ParkingSpot, adjust_available_spots, mark_spot_claimed
+import heapq
+import threading
+
+class SpotAllocator:
+    """
+    Per-lot min-heaps of free spot ids, so the first available spot is picked in O(log n).
+    The heap is only a hint: a spot is owned once the conditional UPDATE in claim_spot succeeds,
+    so stale entries (spots taken by another worker, deleted spots) are simply skipped.
+    """
+
+    def __init__(self):
+        self._free = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, lot_id=None):
+        query = db.session.query(ParkingSpot.lot_id, ParkingSpot.id).filter(ParkingSpot.is_available == True)
+        if lot_id is not None:
+            query = query.filter(ParkingSpot.lot_id == lot_id)
+
+        free = {} if lot_id is None else {lot_id: []}
+        for spot_lot_id, spot_id in query.order_by(ParkingSpot.id):
+            free.setdefault(spot_lot_id, []).append(spot_id)
+
+        # ids come back sorted, which is already a valid heap
+        with self._lock:
+            if lot_id is None:
+                self._free = free
+            else:
+                self._free[lot_id] = free[lot_id]
+
+    def forget(self, lot_id=None):
+        """Drop the cached heap for a lot (or all lots); it is rebuilt on next use."""
+        with self._lock:
+            if lot_id is None:
+                self._free.clear()
+            else:
+                self._free.pop(lot_id, None)
+
+    def release(self, lot_id, spot_id):
+        """Hand a freed spot back to its lot's heap. Call after the release has been committed."""
+        with self._lock:
+            heap = self._free.get(lot_id)
+            if heap is not None:
+                heapq.heappush(heap, spot_id)
+
+    def _pop(self, lot_id):
+        with self._lock:
+            heap = self._free.get(lot_id)
+            return heapq.heappop(heap) if heap else None
+
+    def claim_spot(self, lot_id, spot_id):
+        """
+        Mark a spot as taken with a single conditional UPDATE in the current transaction.
+        Returns False if someone else got there first.
+        """
+        result = db.session.execute(
+            db.update(ParkingSpot)
+            .where(ParkingSpot.id == spot_id, ParkingSpot.is_available == True)
+            .values(is_available=False)
+        )
+        if result.rowcount != 1:
+            return False
+        adjust_available_spots(db.session.connection(), {lot_id: -1})
+        mark_spot_claimed(db.session, spot_id)
+        return True
+
+    def free_spot(self, lot_id, spot_id):
+        """
+        Mark a spot as free with a single conditional UPDATE in the current transaction, moving the
+        lot's counter only if this call changed the row. Returns False if the spot was already free.
+        """
+        result = db.session.execute(
+            db.update(ParkingSpot)
+            .where(ParkingSpot.id == spot_id, ParkingSpot.is_available == False)
+            .values(is_available=True)
+        )
+        if result.rowcount != 1:
+            return False
+        adjust_available_spots(db.session.connection(), {lot_id: 1})
+        return True
+
+    def claim(self, lot_id):
+        """
+        Claim the lowest free spot id in a lot. Returns the spot id, or None if the lot is full.
+        The caller owns the transaction and must commit (or rollback and release()).
+        """
+        if lot_id not in self._free:
+            self.rebuild(lot_id)
+
+        rebuilt = False
+        while True:
+            spot_id = self._pop(lot_id)
+            if spot_id is None:
+                # Another worker may have freed spots we never saw; look once more in the DB
+                if rebuilt:
+                    return None
+                self.rebuild(lot_id)
+                rebuilt = True
+                continue
+            if self.claim_spot(lot_id, spot_id):
+                return spot_id
+
+allocator = SpotAllocator()
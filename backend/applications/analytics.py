@@ -0,0 +1,275 @@
+from applications.models import db, DailyActivity, LotUsageRollup, ParkingLot, ParkingSpot, ReservedParking, TaskWatermark
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+import numpy as np
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+GRAINS = {"hour": HOUR, "day": DAY}
+# Most buckets one stats request may ask for, and the window it gets by default
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366}
+STATS_SPAN = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+
+ROLLUP_WATERMARK = "rollup_usage"
+# Hours rolled up per call; a backlog (first run, downtime) is caught up over successive calls
+MAX_ROLLUP_SPAN = timedelta(days=31)
+# Hourly rows are kept this long, daily rows and activity forever
+HOURLY_RETENTION = timedelta(days=90)
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def floor_day(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _stays(start, end):
+    """
+    (lot_id, user_id, park_time, exit_time, total_cost) of every stay that overlaps [start, end):
+    closed ones found through the exit_time index, open ones through the partial index on open reservations.
+    """
+    query = (
+        db.select(ParkingSpot.lot_id, ReservedParking.user_id, ReservedParking.park_time,
+                  ReservedParking.exit_time, ReservedParking.total_cost)
+        .join(ParkingSpot, ParkingSpot.id == ReservedParking.spot_id)
+        .where(ReservedParking.park_time < end)
+    )
+    return (db.session.execute(query.where(ReservedParking.exit_time >= start)).all()
+            + db.session.execute(query.where(ReservedParking.exit_time == None)).all())
+
+def _seconds_since(start, times, default):
+    return np.fromiter(
+        ((t - start).total_seconds() if t is not None else default for t in times),
+        dtype=np.float64, count=len(times)
+    )
+
+def _hour_rows(lot_ids, park, leave, costs, hours):
+    """
+    (lot_index, hour, revenue, releases, occupied_seconds) of every active lot-hour of the window, from
+    stays given as seconds since the window start. Revenue counts in the hour a stay ended.
+    """
+    lots, lot_index = np.unique(lot_ids, return_inverse=True)
+    cells = len(lots) * hours
+    occupied = np.zeros(cells)
+    for hour in range(hours):
+        overlap = np.clip(np.minimum(leave, (hour + 1) * 3600) - np.maximum(park, hour * 3600), 0, None)
+        occupied[hour::hours] = np.bincount(lot_index, weights=overlap, minlength=len(lots))
+    ended = ~np.isnan(costs) & (leave >= 0) & (leave < hours * 3600)
+    cell = lot_index[ended] * hours + (leave[ended] // 3600).astype(np.int64)
+    revenue = np.bincount(cell, weights=costs[ended], minlength=cells)
+    releases = np.bincount(cell, minlength=cells)
+    return [
+        (int(lots[i // hours]), i % hours, round(float(revenue[i]), 2), int(releases[i]), float(occupied[i]))
+        for i in np.flatnonzero((occupied > 0) | (releases > 0)).tolist()
+    ]
+
+def _roll_days(start, end, hour_rows):
+    """
+    Rebuild the daily rows of every day touched by [start, end) from `hour_rows`
+    plus the stored hourly rows of the first day before `start`.
+    """
+    first_day = floor_day(start)
+    earlier = db.session.execute(
+        db.select(LotUsageRollup.lot_id, LotUsageRollup.bucket, LotUsageRollup.revenue,
+                  LotUsageRollup.releases, LotUsageRollup.occupied_seconds)
+        .where(LotUsageRollup.grain == "hour", LotUsageRollup.bucket >= first_day, LotUsageRollup.bucket < start)
+    ).all()
+    totals = defaultdict(lambda: [0.0, 0, 0.0])
+    for lot_id, bucket, revenue, releases, occupied in earlier + hour_rows:
+        total = totals[lot_id, floor_day(bucket)]
+        total[0] += revenue
+        total[1] += releases
+        total[2] += occupied
+
+    db.session.execute(
+        db.delete(LotUsageRollup)
+        .where(LotUsageRollup.grain == "day", LotUsageRollup.bucket >= first_day, LotUsageRollup.bucket < end)
+    )
+    if totals:
+        db.session.execute(LotUsageRollup.__table__.insert(), [{
+            "lot_id": lot_id,
+            "grain": "day",
+            "bucket": day,
+            "revenue": round(revenue, 2),
+            "releases": releases,
+            "occupied_seconds": occupied,
+        } for (lot_id, day), (revenue, releases, occupied) in totals.items()])
+
+def _roll_activity(user_ids, park, leave, first_day, end):
+    """Active users and started stays per day from [first_day, end), stays given as seconds since first_day."""
+    window = (end - first_day).total_seconds()
+    day = 0
+    while day * DAY.total_seconds() < window:
+        low = day * DAY.total_seconds()
+        high = min(low + DAY.total_seconds(), window)
+        present = (park < high) & ((leave > low) | (park >= low))
+        db.session.merge(DailyActivity(
+            day=first_day + day * DAY,
+            active_users=len(np.unique(user_ids[present])),
+            reservations=int(((park >= low) & (park < high)).sum()),
+        ))
+        day += 1
+
+def roll_range(start, end, now=None):
+    """
+    Recompute hourly rows, daily rows and activity for [start, end) without committing, from one
+    fetch of the stays overlapping [start of the first day, end). Hours already past HOURLY_RETENTION
+    only feed the daily rows, so a backfill does not write them.
+    """
+    first_day = floor_day(start)
+    hours = int((end - start) / HOUR)
+    stays = _stays(first_day, end)
+    lot_ids, user_ids, park_times, exit_times, costs = zip(*stays) if stays else ((),) * 5
+    # Open stays occupy their spot up to the end of the window, which is in the past
+    park = _seconds_since(first_day, park_times, 0)
+    leave = _seconds_since(first_day, exit_times, (end - first_day).total_seconds())
+    # NaN marks the open stays, which have no revenue yet
+    costs = np.array([np.nan if exit is None else cost or 0 for cost, exit in zip(costs, exit_times)], dtype=np.float64)
+    user_ids = np.array(user_ids, dtype=np.int64)
+
+    offset = (start - first_day).total_seconds()
+    hour_rows = [
+        (lot_id, start + hour * HOUR, revenue, releases, occupied)
+        for lot_id, hour, revenue, releases, occupied
+        in _hour_rows(np.array(lot_ids, dtype=np.int64), park - offset, leave - offset, costs, hours)
+    ]
+    cutoff = (now or datetime.now()) - HOURLY_RETENTION
+    db.session.execute(
+        db.delete(LotUsageRollup)
+        .where(LotUsageRollup.grain == "hour", LotUsageRollup.bucket >= start, LotUsageRollup.bucket < end)
+    )
+    kept = [row for row in hour_rows if row[1] >= cutoff]
+    if kept:
+        db.session.execute(LotUsageRollup.__table__.insert(), [{
+            "lot_id": lot_id,
+            "grain": "hour",
+            "bucket": bucket,
+            "revenue": revenue,
+            "releases": releases,
+            "occupied_seconds": occupied,
+        } for lot_id, bucket, revenue, releases, occupied in kept])
+    _roll_days(start, end, hour_rows)
+    _roll_activity(user_ids, park, leave, first_day, end)
+
+def rollup_usage(now=None):
+    """
+    Roll up the whole hours between the watermark and `now`, at most MAX_ROLLUP_SPAN per call.
+    The rows and the advanced watermark are committed together; when two workers race, the one
+    whose conditional watermark UPDATE misses rolls back. Returns (start, end) or None.
+    """
+    limit = floor_hour(now or datetime.now())
+    watermark = db.session.get(TaskWatermark, ROLLUP_WATERMARK)
+    if watermark is None:
+        first_stay = db.session.query(db.func.min(ReservedParking.park_time)).scalar()
+        previous = None
+        start = floor_day(first_stay) if first_stay else limit
+    else:
+        previous = start = watermark.value
+    end = min(limit, start + MAX_ROLLUP_SPAN)
+    if end <= start:
+        return None
+
+    roll_range(start, end, now)
+    if previous is None:
+        db.session.add(TaskWatermark(ROLLUP_WATERMARK, end))
+    elif not db.session.execute(
+        db.update(TaskWatermark)
+        .where(TaskWatermark.name == ROLLUP_WATERMARK, TaskWatermark.value == previous)
+        .values(value=end)
+    ).rowcount:
+        db.session.rollback()
+        return None
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return start, end
+
+def rebuild_usage(since=None, until=None):
+    """
+    Recompute already rolled-up days in [since, until) after past reservations changed
+    (e.g. `flask recompute-costs`). Whole days, one commit per MAX_ROLLUP_SPAN.
+    """
+    watermark = db.session.get(TaskWatermark, ROLLUP_WATERMARK)
+    if watermark is None:
+        return 0
+    if since is None:
+        since = db.session.query(db.func.min(ReservedParking.park_time)).scalar() or watermark.value
+    start = floor_day(since)
+    end = min(until or watermark.value, watermark.value)
+    days = 0
+    while start < end:
+        chunk_end = min(start + MAX_ROLLUP_SPAN, end)
+        roll_range(start, chunk_end)
+        db.session.commit()
+        days += (chunk_end - start).days
+        start = chunk_end
+    return days
+
+def purge_hourly_usage(now=None):
+    cutoff = (now or datetime.now()) - HOURLY_RETENTION
+    purged = db.session.execute(
+        db.delete(LotUsageRollup).where(LotUsageRollup.grain == "hour", LotUsageRollup.bucket < cutoff)
+    ).rowcount
+    db.session.commit()
+    return purged
+
+def usage_stats(grain, start, end):
+    """
+    Revenue and occupancy per lot per bucket for [start, end), as arrays aligned with "buckets",
+    plus active users per day (day grain) and the current spot counts. O(lots x buckets).
+    """
+    step = GRAINS[grain]
+    first = floor_hour(start) if grain == "hour" else floor_day(start)
+    buckets = []
+    bucket = first
+    while bucket < end:
+        buckets.append(bucket)
+        bucket += step
+    if len(buckets) > MAX_BUCKETS[grain]:
+        raise ValueError(f"At most {MAX_BUCKETS[grain]} {grain} buckets per request")
+    position = {bucket: i for i, bucket in enumerate(buckets)}
+
+    lots = db.session.query(
+        ParkingLot.id, ParkingLot.prime_location_name, ParkingLot.number_of_spots, ParkingLot.available_spots
+    ).order_by(ParkingLot.id).all()
+    series = {lot.id: ([0.0] * len(buckets), [0.0] * len(buckets)) for lot in lots}
+    for lot_id, bucket, revenue, occupied in db.session.execute(
+        db.select(LotUsageRollup.lot_id, LotUsageRollup.bucket, LotUsageRollup.revenue, LotUsageRollup.occupied_seconds)
+        .where(LotUsageRollup.grain == grain, LotUsageRollup.bucket >= first, LotUsageRollup.bucket < end)
+    ):
+        if lot_id in series and bucket in position:
+            series[lot_id][0][position[bucket]] = revenue
+            series[lot_id][1][position[bucket]] = occupied
+
+    bucket_seconds = step.total_seconds()
+    watermark = db.session.get(TaskWatermark, ROLLUP_WATERMARK)
+    stats = {
+        "grain": grain,
+        "buckets": [bucket.isoformat() for bucket in buckets],
+        "rolled_up_to": watermark.value.isoformat() if watermark else None,
+        "lots": [{
+            "id": lot.id,
+            "prime_location_name": lot.prime_location_name,
+            "revenue": series[lot.id][0],
+            # Share of the lot's spot-time that was parked, against its current size
+            "occupancy": [
+                round(occupied / (lot.number_of_spots * bucket_seconds), 4) if lot.number_of_spots else 0
+                for occupied in series[lot.id][1]
+            ],
+        } for lot in lots],
+        "spots": {
+            "available": sum(lot.available_spots for lot in lots),
+            "occupied": sum(lot.number_of_spots - lot.available_spots for lot in lots),
+        },
+    }
+    if grain == "day":
+        active_users = [0] * len(buckets)
+        for day, users in db.session.query(DailyActivity.day, DailyActivity.active_users).filter(
+            DailyActivity.day >= first, DailyActivity.day < end
+        ):
+            if day in position:
+                active_users[position[day]] = users
+        stats["active_users"] = active_users
+    return stats
@@ -0,0 +1,93 @@
+from flask import request, make_response
+from flask_caching import Cache
+from flask_jwt_extended import get_jwt_identity
+from functools import wraps
+from urllib.parse import urlencode
+import logging
+import time
+
+cache = Cache()
+logger = logging.getLogger(__name__)
+
+# Hit/miss counters for the cached read endpoints, per process; served by GET /cache_stats
+cache_stats = {"hits": 0, "misses": 0}
+
+def _namespace_key(name):
+    return f"ns:{name}"
+
+def namespace_versions(names):
+    """
+    Return the current version token of every namespace in `names`.
+    A namespace that has never been bumped (or was evicted) gets a fresh token,
+    so entries stored under an older token can never become visible again.
+    Returns None when the cache backend is unavailable; callers then skip the cache.
+    """
+    keys = [_namespace_key(name) for name in names]
+    try:
+        versions = cache.get_many(*keys) if keys else []
+        for i, version in enumerate(versions):
+            if version is None:
+                cache.add(keys[i], time.time_ns(), timeout=0)
+                versions[i] = cache.get(keys[i])
+    except Exception:
+        logger.exception("Cache backend unavailable, reading %s uncached", names)
+        return None
+    return versions
+
+def invalidate(*names):
+    """
+    Bump the version of each namespace so every cached response that depends on it is skipped.
+    Old entries are never read again and simply expire.
+    Called after a commit, so a cache outage is logged and never fails the request.
+    """
+    try:
+        for name in names:
+            cache.set(_namespace_key(name), time.time_ns(), timeout=0)
+    except Exception:
+        logger.exception("Cache backend unavailable, %s not invalidated", names)
+
+def cached_response(timeout, namespaces, per_user=False, query_string=False):
+    """
+    Cache a view's JSON response under a key built from the request path, the namespace versions
+    and, optionally, the JWT identity and the query string.
+    Must be placed below @app.route and the auth decorators so it only sees authorised requests.
+    Namespaces may contain "{identity}" to scope them to the current user, e.g. "user:{identity}".
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            identity = get_jwt_identity() if per_user else None
+            names = [ns.format(identity=identity) for ns in namespaces]
+            versions = namespace_versions(names)
+            if versions is None:
+                return f(*args, **kwargs)
+
+            key_parts = ["view", request.path]
+            if per_user:
+                key_parts.append(f"identity={identity}")
+            if query_string:
+                key_parts.append(urlencode(sorted(request.args.items(multi=True))))
+            key_parts.extend(f"{name}@{version}" for name, version in zip(names, versions))
+            key = "|".join(key_parts)
+
+            try:
+                cached = cache.get(key)
+            except Exception:
+                logger.exception("Cache backend unavailable, serving %s uncached", request.path)
+                return f(*args, **kwargs)
+            if cached is not None:
+                cache_stats["hits"] += 1
+                body, status, content_type = cached
+                return make_response(body, status, {"Content-Type": content_type})
+
+            cache_stats["misses"] += 1
+            response = make_response(f(*args, **kwargs))
+            # Only successful responses are worth keeping
+            if response.status_code == 200:
+                try:
+                    cache.set(key, (response.get_data(), response.status_code, response.content_type), timeout=timeout)
+                except Exception:
+                    logger.exception("Cache backend unavailable, %s not stored", request.path)
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,79 @@
+from applications.models import db, ParkingLot, ParkingSpot, ReservedParking
+import csv
+import json
+
+EXPORT_BATCH_SIZE = 1000
+
+CSV_HEADER = ['Reservation ID', 'User ID', 'Spot ID', 'Parking Lot Name', 'Park Time', 'Exit Time', 'Total Cost']
+
+class _LineBuffer:
+    """File-like sink for csv.writer that hands back each formatted line instead of storing it."""
+    def write(self, line):
+        return line
+
+def reservation_export_query():
+    """
+    One joined SELECT for reservation export rows (lot name resolved in SQL, no per-row lookups).
+    Rows are fetched in batches of EXPORT_BATCH_SIZE from a streaming cursor.
+    """
+    return (
+        db.select(
+            ReservedParking.id,
+            ReservedParking.user_id,
+            ReservedParking.spot_id,
+            ParkingLot.prime_location_name,
+            ReservedParking.park_time,
+            ReservedParking.exit_time,
+            ReservedParking.total_cost,
+        )
+        .join(ParkingSpot, ParkingSpot.id == ReservedParking.spot_id)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .order_by(ReservedParking.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE, stream_results=True)
+    )
+
+def iter_export_rows(statement):
+    for row in db.session.execute(statement):
+        yield row
+
+def _chunked(lines):
+    # Hand the WSGI server one write per batch rather than per row
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def stream_csv(rows):
+    writer = csv.writer(_LineBuffer())
+    # Header goes out on its own so the client sees bytes before the first batch is fetched
+    yield writer.writerow(CSV_HEADER)
+    yield from _chunked(
+        writer.writerow([
+            res_id,
+            user_id,
+            spot_id,
+            lot_name or 'N/A',
+            park_time.strftime('%Y-%m-%d %H:%M:%S') if park_time else 'N/A',
+            exit_time.strftime('%Y-%m-%d %H:%M:%S') if exit_time else 'N/A',
+            f"{total_cost:.2f}" if total_cost is not None else 'N/A'
+        ])
+        for res_id, user_id, spot_id, lot_name, park_time, exit_time, total_cost in rows
+    )
+
+def stream_ndjson(rows):
+    yield from _chunked(
+        json.dumps({
+            "id": res_id,
+            "user_id": user_id,
+            "spot_id": spot_id,
+            "lot_name": lot_name,
+            "park_time": park_time.isoformat() if park_time else None,
+            "exit_time": exit_time.isoformat() if exit_time else None,
+            "total_cost": total_cost
+        }) + "\n"
+        for res_id, user_id, spot_id, lot_name, park_time, exit_time, total_cost in rows
+    )
@@ -0,0 +1,62 @@
+from flask import request, jsonify, make_response, g, current_app as app
+from flask_jwt_extended import get_jwt_identity
+from applications.models import db, IdempotencyKey
+from sqlalchemy.exc import IntegrityError
+from functools import wraps
+
+MAX_KEY_LENGTH = 255
+
+def _replay(user_id, key):
+    stored = db.session.get(IdempotencyKey, (user_id, key))
+    if stored is None:
+        return None
+    if stored.endpoint != request.path:
+        return jsonify({"message": "Idempotency-Key was already used for a different request"}), 422
+    return make_response(stored.response_body, stored.status_code, {
+        "Content-Type": "application/json",
+        "Idempotent-Replayed": "true",
+    })
+
+def remember_response(body, status_code):
+    """
+    Store the response for the request's Idempotency-Key (if any) in the current transaction,
+    so the key exists exactly when the change it protects has been committed.
+    """
+    if "idempotency_key" not in g:
+        return
+    user_id, key = g.idempotency_key
+    db.session.add(IdempotencyKey(user_id, key, request.path, status_code, app.json.dumps(body)))
+
+def idempotent(f):
+    """
+    Honour an Idempotency-Key request header: a retried request gets the stored response of the
+    first one instead of running again. Place below the auth decorator; the view must call
+    remember_response() before it commits.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        user_id = int(get_jwt_identity())
+        replay = _replay(user_id, key)
+        if replay is not None:
+            return replay
+
+        g.idempotency_key = (user_id, key)
+        try:
+            return f(*args, **kwargs)
+        except IntegrityError:
+            # A concurrent request with the same key committed first; answer with its response
+            db.session.rollback()
+            replay = _replay(user_id, key)
+            if replay is None:
+                raise
+            return replay
+        finally:
+            # g outlives the request when an app context was already pushed (CLI, tests)
+            g.pop("idempotency_key", None)
+    return decorated_function
@@ -0,0 +1,26 @@
+from applications.models import db
+from sqlalchemy import event
+from contextlib import contextmanager
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements sent to the database inside the block:
+
+        with count_queries() as counter:
+            ...
+        print(counter.count)
+    """
+    counter = QueryCounter()
+    event.listen(db.engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, "before_cursor_execute", counter)
@@ -0,0 +1,65 @@
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from datetime import date, datetime, timezone
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib provider is used without it
+    orjson = None
+
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def _default(o):
+    # Keep Flask's wire format for dates (RFC 822, e.g. "Sun, 18 Oct 2026 15:30:29 GMT").
+    # Same result as werkzeug's http_date, formatted directly since listings carry thousands of them.
+    if isinstance(o, datetime):
+        if o.tzinfo is not None:
+            o = o.astimezone(timezone.utc)
+        return (f"{_DAYS[o.weekday()]}, {o.day:02d} {_MONTHS[o.month - 1]} {o.year:04d} "
+                f"{o.hour:02d}:{o.minute:02d}:{o.second:02d} GMT")
+    if isinstance(o, date):
+        return http_date(o)
+    return DefaultJSONProvider.default(o)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Drop-in replacement for Flask's JSON provider backed by orjson.
+    Output matches the default provider (sorted keys, same date format) apart from
+    non-ASCII characters being written as UTF-8 instead of \\u escapes.
+    Anything orjson cannot encode is handed to the default provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps(obj, indent=kwargs.get("indent")).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        # orjson already returns bytes, so skip the str round trip of the default provider
+        return self._app.response_class(self._dumps(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+    def _dumps(self, obj, indent=None):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            # orjson rejects some values the stdlib accepts (e.g. integers beyond 64 bits)
+            return super().dumps(obj, indent=indent).encode()
+
+JSON_PROVIDERS = {"default": DefaultJSONProvider}
+if orjson is not None:
+    JSON_PROVIDERS["orjson"] = OrjsonProvider
+
+def init_json_provider(app):
+    """Install the provider named by JSON_PROVIDER, falling back to Flask's when it is unavailable."""
+    provider_class = JSON_PROVIDERS.get(app.config.get("JSON_PROVIDER"), DefaultJSONProvider)
+    app.json_provider_class = provider_class
+    app.json = provider_class(app)
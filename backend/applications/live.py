@@ -0,0 +1,157 @@
+from applications.models import db, ParkingLot
+import json
+import queue
+import redis
+import threading
+import time
+
+CHANNEL = "parking:availability"
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class Subscription:
+    def __init__(self, broker):
+        self._broker = broker
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # A client that stopped reading is told to refetch instead of holding memory
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(json.dumps({"type": "resync", "lot_id": None}))
+
+    def get(self, timeout):
+        """Next message, or None after `timeout` seconds without one."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+class LocalBroker:
+    """
+    In-process fan-out: every published message is handed to each open subscription.
+    Enough for a single worker and for tests; RedisBroker builds on it across workers.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def publish(self, message):
+        self.deliver(message)
+
+class RedisBroker(LocalBroker):
+    """
+    One Redis PUBLISH per change; each worker runs a single listener thread on the channel and
+    fans messages out to its own SSE clients, so N dashboards never mean N Redis connections.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="live-availability", daemon=True)
+                self._listener.start()
+        return super().subscribe()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for item in pubsub.listen():
+                    self.deliver(item["data"].decode())
+            except redis.RedisError as e:
+                print(f"Warning: availability listener lost Redis ({e}), reconnecting")
+                # Messages may have been missed while disconnected
+                self.deliver(json.dumps({"type": "resync", "lot_id": None}))
+                time.sleep(1)
+
+    def publish(self, message):
+        try:
+            self._redis.publish(CHANNEL, message)
+        except redis.RedisError as e:
+            # The change is committed either way; clients recover on their next resync
+            print(f"Warning: could not publish availability change: {e}")
+
+broker = LocalBroker()
+
+def init_live(app):
+    global broker
+    if app.config.get("LIVE_BROKER") == "redis":
+        broker = RedisBroker(app.config["LIVE_REDIS_URL"])
+    else:
+        broker = LocalBroker()
+
+def _available_spots(lot_id):
+    return db.session.query(ParkingLot.available_spots).filter(ParkingLot.id == lot_id).scalar()
+
+def publish_spot(lot_id, spot_id, is_available):
+    """Announce a committed reserve/release, with the lot's counter after the change."""
+    broker.publish(json.dumps({
+        "type": "spot",
+        "lot_id": lot_id,
+        "spot_id": spot_id,
+        "is_available": is_available,
+        "available_spots": _available_spots(lot_id),
+    }))
+
+def publish_resync(lot_id=None):
+    """Tell clients to refetch a lot (resize, delete) or everything (lot_id=None)."""
+    broker.publish(json.dumps({"type": "resync", "lot_id": lot_id}))
+
+def snapshot(lot_id=None):
+    query = db.session.query(ParkingLot.id, ParkingLot.available_spots)
+    if lot_id is not None:
+        query = query.filter(ParkingLot.id == lot_id)
+    return {"type": "snapshot", "available_spots": {str(lot): count for lot, count in query}}
+
+def event_stream(subscription, first, lot_id=None):
+    """
+    text/event-stream body: the initial snapshot, then every message for `lot_id` (all lots when None),
+    with a comment line as heartbeat so proxies keep the connection open.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        yield f"event: availability\ndata: {json.dumps(first)}\n\n"
+        while True:
+            message = subscription.get(timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            if lot_id is not None:
+                event_lot = json.loads(message).get("lot_id")
+                if event_lot is not None and event_lot != lot_id:
+                    continue
+            yield f"event: availability\ndata: {message}\n\n"
+    finally:
+        subscription.close()
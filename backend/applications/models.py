@@ -1,11 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from flask_bcrypt import Bcrypt
+from applications.passwords import hash_password
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
 class User(db.Model):
+    __table_args__ = (
+        # Reminder sweep: non-admin users whose last_login crossed the inactivity threshold
+        db.Index('ix_user_admin_last_login', 'admin', 'last_login'),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(80), nullable=False)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -13,13 +17,14 @@ class User(db.Model):
     password = db.Column(db.String(120), nullable=False)
     admin = db.Column(db.Boolean, nullable=False, default=False)
     last_login = db.Column(db.DateTime, default=datetime.now)
-    reservations = db.relationship('ReservedParking', backref='user', lazy=True, cascade="all, delete-orphan")
+    last_reminded_at = db.Column(db.DateTime, nullable=True)
+    reservations = db.relationship('ReservedParking', backref='user', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, name, username, email, password, admin=False):
         self.name = name
         self.username = username
         self.email = email
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = hash_password(password)
         self.admin = admin
 
     def to_dict(self):
@@ -37,17 +42,24 @@ class ParkingLot(db.Model):
     prime_location_name = db.Column(db.String(80), nullable=False)
     price = db.Column(db.Float, nullable=False)
     address = db.Column(db.String(120), nullable=False)
-    pin_code = db.Column(db.String(6), nullable=False)
+    pin_code = db.Column(db.String(6), nullable=False, index=True)
     number_of_spots = db.Column(db.Integer, nullable=False)
+    # Denormalized count of free spots, kept in sync by the flush listener at the bottom of this file
+    available_spots = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     location_id = db.Column(db.Integer, db.ForeignKey('location.id', ondelete='CASCADE'), nullable=False)
-    spots = db.relationship('ParkingSpot', backref='lot', lazy=True, cascade="all, delete-orphan")
+    # Tariff rules on top of the hourly price, see applications/pricing.py
+    daily_cap = db.Column(db.Float, nullable=True)
+    tariff_bands = db.Column(db.JSON, nullable=True)
+    spots = db.relationship('ParkingSpot', backref='lot', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
-    def __init__(self, prime_location_name, price, address, pin_code, number_of_spots):
+    def __init__(self, prime_location_name, price, address, pin_code, number_of_spots, daily_cap=None, tariff_bands=None):
         self.prime_location_name = prime_location_name
         self.price = price
         self.address = address
         self.pin_code = pin_code
         self.number_of_spots = number_of_spots
+        self.daily_cap = daily_cap
+        self.tariff_bands = tariff_bands
     
     def to_dict(self):
         return {
@@ -57,14 +69,22 @@ class ParkingLot(db.Model):
             "address": self.address,
             "pin_code": self.pin_code,
             "number_of_spots": self.number_of_spots,
-            "location_id": self.location_id
+            "available_spots": self.available_spots,
+            "location_id": self.location_id,
+            "daily_cap": self.daily_cap,
+            "tariff_bands": self.tariff_bands
         }
 
 class ParkingSpot(db.Model):
+    __table_args__ = (
+        # Free spots per lot: allocator rebuilds, availability counts, ?lot_id=&available= filters
+        db.Index('ix_parking_spot_lot_available', 'lot_id', 'is_available'),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id', ondelete='CASCADE'), nullable=False)
     is_available = db.Column(db.Boolean, nullable=False, default=True)
-    reservation = db.relationship('ReservedParking', backref='spot', lazy=True, cascade="all, delete-orphan")
+    reservation = db.relationship('ReservedParking', backref='spot', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, lot_id, is_available=True):
         self.lot_id = lot_id
@@ -83,7 +103,7 @@ class Location(db.Model):
     city = db.Column(db.String(80), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    lots = db.relationship('ParkingLot', backref='location', lazy=True, cascade="all, delete-orphan")
+    lots = db.relationship('ParkingLot', backref='location', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, name, city, latitude, longitude):
         self.name = name
@@ -101,10 +121,103 @@ class Location(db.Model):
             "lots": [lot.to_dict() for lot in self.lots]
         }
 
+class TaskWatermark(db.Model):
+    # High-water mark of a periodic job, so each period is processed exactly once
+    name = db.Column(db.String(80), primary_key=True)
+    value = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+class OutboxMessage(db.Model):
+    # Celery task calls written in the same transaction as the change that triggers them,
+    # sent to the broker afterwards by applications.outbox
+    __table_args__ = (
+        db.Index('ix_outbox_message_pending', 'available_at',
+                 sqlite_where=db.text('dispatched_at IS NULL'), postgresql_where=db.text('dispatched_at IS NULL')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    task = db.Column(db.String(120), nullable=False)
+    args = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # Earliest time a dispatcher may pick the message up (lease expiry / retry backoff)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    dispatched_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, task, args):
+        self.task = task
+        self.args = args
+
+class IdempotencyKey(db.Model):
+    # Response of a write request sent with an Idempotency-Key header, replayed on retries
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    endpoint = db.Column(db.String(255), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    def __init__(self, user_id, key, endpoint, status_code, response_body):
+        self.user_id = user_id
+        self.key = key
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.response_body = response_body
+
+class LotUsageRollup(db.Model):
+    # Per-lot revenue and occupancy per hour and per day, written by applications.analytics.
+    # Only buckets with activity get a row.
+    __table_args__ = (
+        db.Index('ix_lot_usage_rollup_grain_bucket', 'grain', 'bucket'),
+    )
+
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id', ondelete='CASCADE'), primary_key=True)
+    grain = db.Column(db.String(4), primary_key=True)  # "hour" or "day"
+    bucket = db.Column(db.DateTime, primary_key=True)  # start of the hour / day
+    revenue = db.Column(db.Float, nullable=False, default=0)  # total_cost of stays that ended in the bucket
+    releases = db.Column(db.Integer, nullable=False, default=0)
+    occupied_seconds = db.Column(db.Float, nullable=False, default=0)  # spot-seconds parked within the bucket
+
+class DailyActivity(db.Model):
+    # Distinct users parked at some point of the day and stays started that day
+    day = db.Column(db.DateTime, primary_key=True)
+    active_users = db.Column(db.Integer, nullable=False, default=0)
+    reservations = db.Column(db.Integer, nullable=False, default=0)
+
+class LotOccupancy(db.Model):
+    # Occupied spots per lot over time, recorded by record_occupancy() whenever a lot's counter moves.
+    # One row per (lot, resolution, bucket) that saw a change; readers carry the last count forward.
+    # Times are whole seconds since the epoch of the naive local clock.
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id', ondelete='CASCADE'), primary_key=True)
+    resolution = db.Column(db.Integer, primary_key=True)  # bucket length in seconds, see OCCUPANCY_RESOLUTIONS
+    bucket = db.Column(db.Integer, primary_key=True)  # bucket start
+    occupied = db.Column(db.Integer, nullable=False)  # count after the last change in the bucket
+    low = db.Column(db.Integer, nullable=False)
+    peak = db.Column(db.Integer, nullable=False)
+    occupied_seconds = db.Column(db.Integer, nullable=False)  # spot-seconds from the bucket start to last_change
+    last_change = db.Column(db.Integer, nullable=False)
+
 class ReservedParking(db.Model):
+    __table_args__ = (
+        # A user's history newest first; the user_id prefix also serves the FK and per-user lookups
+        db.Index('ix_reserved_parking_user_park_time', 'user_id', 'park_time'),
+        # Admin history newest first and monthly report ranges
+        db.Index('ix_reserved_parking_park_time', 'park_time'),
+        # Partial index over open reservations only (exit_time IS NULL), a small fraction of the table
+        db.Index('ix_reserved_parking_active', 'park_time',
+                 sqlite_where=db.text('exit_time IS NULL'), postgresql_where=db.text('exit_time IS NULL')),
+        # Stays that ended in a window: usage rollups and cost settlement by day
+        db.Index('ix_reserved_parking_exit_time', 'exit_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
-    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id', ondelete='CASCADE'), nullable=False)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id', ondelete='CASCADE'), nullable=False, index=True)
     park_time = db.Column(db.DateTime, nullable=False)
     exit_time = db.Column(db.DateTime, nullable=True)
     total_cost = db.Column(db.Float, nullable=True)
@@ -127,31 +240,210 @@ class ReservedParking(db.Model):
         }
 
 
-from sqlalchemy.orm import Session
-from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Fine samples for recent windows, hourly ones for long ranges; both are written on every change
+OCCUPANCY_RESOLUTIONS = (5 * 60, 60 * 60)
+EPOCH = datetime(1970, 1, 1)
+# Dialects with INSERT ... ON CONFLICT DO UPDATE; others do not record occupancy
+_UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+@event.listens_for(Session, 'before_flush')
+def free_reserved_spots(session, flush_context, instances):
+    """
+    Free the spots held by open reservations of users being deleted.
+    Runs before the flush so the reservations still exist, and uses two set-based UPDATEs
+    on the session's connection instead of loading every reservation and spot.
+    """
+    user_ids = [obj.id for obj in session.deleted if isinstance(obj, User) and obj.id is not None]
+    if not user_ids:
+        return
+
+    spot_table = ParkingSpot.__table__
+    lot_table = ParkingLot.__table__
+    open_spot_ids = (
+        db.select(ReservedParking.spot_id)
+        .where(ReservedParking.user_id.in_(user_ids), ReservedParking.exit_time == None)
+    )
+    held = db.and_(spot_table.c.is_available == False, spot_table.c.id.in_(open_spot_ids))
+
+    # Counters first, while the spots are still marked as taken
+    freed_in_lot = (
+        db.select(db.func.count())
+        .select_from(spot_table)
+        .where(spot_table.c.lot_id == lot_table.c.id, held)
+        .scalar_subquery()
+    )
+    connection = session.connection()
+    lot_ids = connection.execute(db.select(spot_table.c.lot_id).where(held).distinct()).scalars().all()
+    connection.execute(
+        lot_table.update()
+        .where(lot_table.c.id.in_(db.select(spot_table.c.lot_id).where(held)))
+        .values(available_spots=lot_table.c.available_spots + freed_in_lot)
+    )
+    connection.execute(spot_table.update().where(held).values(is_available=True))
+    record_occupancy(connection, lot_ids)
 
-@event.listens_for(User, 'before_delete')
-def free_reserved_spots(mapper, connection, target):
-    session = Session(bind=connection)
-    reservations = session.query(ReservedParking).filter_by(user_id=target.id).all()
-    for res in reservations:
-        spot = session.query(ParkingSpot).get(res.spot_id)
-        if spot:
-            spot.is_available = True
-            session.add(spot)
-    session.commit()
+def mark_spot_claimed(session, spot_id):
+    """
+    Record that spot_id was already taken in this transaction, so inserting its reservation
+    does not have to touch parking_spot again.
+    """
+    session.info.setdefault('claimed_spot_ids', set()).add(spot_id)
 
 @event.listens_for(ReservedParking, 'before_insert')
 def update_spot_availability(mapper, connection, target):
-    session = Session(bind=connection)
-    spot = session.query(ParkingSpot).get(target.spot_id)
-    if not spot:
+    session = object_session(target)
+    claimed = session.info.get('claimed_spot_ids', set()) if session is not None else set()
+    if target.spot_id in claimed:
+        claimed.discard(target.spot_id)
+        return
+
+    # Reservations inserted without a claim (seeding, imports) update the spot in the same flush
+    released = target.exit_time is not None and target.exit_time < datetime.now()
+    spot_table = ParkingSpot.__table__
+    result = connection.execute(
+        spot_table.update()
+        .where(spot_table.c.id == target.spot_id, spot_table.c.is_available == (not released))
+        .values(is_available=released)
+    )
+    if result.rowcount:
+        lot_id = connection.execute(
+            db.select(spot_table.c.lot_id).where(spot_table.c.id == target.spot_id)
+        ).scalar()
+        adjust_available_spots(connection, {lot_id: 1 if released else -1})
+
+def adjust_available_spots(connection, deltas):
+    """
+    Apply {lot_id: delta} to ParkingLot.available_spots with one atomic UPDATE per lot,
+    then sample the changed lots' occupancy.
+    """
+    lot_table = ParkingLot.__table__
+    changed = []
+    for lot_id, delta in deltas.items():
+        if lot_id is None or delta == 0:
+            continue
+        connection.execute(
+            lot_table.update()
+            .where(lot_table.c.id == lot_id)
+            .values(available_spots=lot_table.c.available_spots + delta)
+        )
+        changed.append(lot_id)
+    record_occupancy(connection, changed)
+
+def epoch_seconds(value):
+    return int((value - EPOCH).total_seconds())
+
+def _occupancy_upsert(dialect):
+    """INSERT ... ON CONFLICT DO UPDATE of one LotOccupancy sample, built once per dialect."""
+    table = LotOccupancy.__table__
+    lot_id, resolution, bucket, occupied, now = (
+        db.bindparam(name, type_=db.Integer) for name in ("b_lot_id", "b_resolution", "b_bucket", "b_occupied", "b_now")
+    )
+    # The count before this change is whatever the lot's latest earlier bucket ended with
+    before = db.func.coalesce(
+        db.select(table.c.occupied)
+        .where(table.c.lot_id == lot_id, table.c.resolution == resolution, table.c.bucket < bucket)
+        .order_by(table.c.bucket.desc())
+        .limit(1)
+        .scalar_subquery(),
+        occupied,
+    )
+    stmt = _UPSERTS[dialect](table).values(
+        lot_id=lot_id,
+        resolution=resolution,
+        bucket=bucket,
+        occupied=occupied,
+        low=db.case((before < occupied, before), else_=occupied),
+        peak=db.case((before > occupied, before), else_=occupied),
+        occupied_seconds=before * (now - bucket),
+        last_change=now,
+    )
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.lot_id, table.c.resolution, table.c.bucket],
+        set_={
+            "occupied_seconds": table.c.occupied_seconds + table.c.occupied * (new.last_change - table.c.last_change),
+            "occupied": new.occupied,
+            "low": db.case((new.occupied < table.c.low, new.occupied), else_=table.c.low),
+            "peak": db.case((new.occupied > table.c.peak, new.occupied), else_=table.c.peak),
+            "last_change": new.last_change,
+        },
+    )
+
+_occupancy_upserts = {}
+
+def record_occupancy(connection, lot_ids, at=None):
+    """
+    Upsert the current occupied count of each lot into its LotOccupancy bucket at every resolution.
+    Counts are taken from parking_spot rather than passed as deltas, so a sample where nothing
+    changed (a resize, a recount) is harmless. Call after the lot counter UPDATE, whose row lock
+    orders concurrent samples of the same lot.
+    """
+    dialect = connection.dialect.name
+    if dialect not in _UPSERTS or not lot_ids:
         return
+    if dialect not in _occupancy_upserts:
+        _occupancy_upserts[dialect] = _occupancy_upsert(dialect)
+    now = epoch_seconds(at or datetime.now())
+    spot_table = ParkingSpot.__table__
+    counts = dict(connection.execute(
+        db.select(spot_table.c.lot_id, db.func.count())
+        .where(spot_table.c.lot_id.in_(lot_ids), spot_table.c.is_available == False)
+        .group_by(spot_table.c.lot_id)
+    ).all())
+    connection.execute(_occupancy_upserts[dialect], [{
+        "b_lot_id": lot_id,
+        "b_resolution": resolution,
+        "b_bucket": now - now % resolution,
+        "b_occupied": counts.get(lot_id, 0),
+        "b_now": now,
+    } for lot_id in lot_ids for resolution in OCCUPANCY_RESOLUTIONS])
 
-    if target.exit_time is not None and target.exit_time < datetime.now():
-        spot.is_available = True
-    else:
-        spot.is_available = False
+def recount_available_spots(lot_id=None):
+    """
+    Rebuild the available_spots counters from ParkingSpot (startup backfill / drift repair).
+    """
+    free_count = (
+        db.select(db.func.count(ParkingSpot.id))
+        .where(ParkingSpot.lot_id == ParkingLot.id, ParkingSpot.is_available == True)
+        .scalar_subquery()
+    )
+    stmt = db.update(ParkingLot).values(available_spots=free_count)
+    if lot_id is not None:
+        stmt = stmt.where(ParkingLot.id == lot_id)
+    db.session.execute(stmt)
+    # Baseline samples, so occupancy series are known from here on (startup, after seeding)
+    lot_ids = [lot_id] if lot_id is not None else db.session.execute(db.select(ParkingLot.id)).scalars().all()
+    record_occupancy(db.session.connection(), lot_ids)
+    db.session.commit()
 
-    session.add(spot)
-    session.commit()
\ No newline at end of file
+@event.listens_for(Session, 'after_flush')
+def track_available_spots(session, flush_context):
+    """
+    Keep ParkingLot.available_spots in step with every ORM change to ParkingSpot.is_available.
+    Runs inside the flush, so the counter commits or rolls back together with the spot rows.
+    """
+    deltas = {}
+    for spot in session.new:
+        if isinstance(spot, ParkingSpot) and spot.is_available:
+            deltas[spot.lot_id] = deltas.get(spot.lot_id, 0) + 1
+    for spot in session.dirty:
+        if not isinstance(spot, ParkingSpot):
+            continue
+        history = inspect(spot).attrs.is_available.history
+        if not history.has_changes():
+            continue
+        was_available = bool(history.deleted and history.deleted[0])
+        if was_available != bool(spot.is_available):
+            deltas[spot.lot_id] = deltas.get(spot.lot_id, 0) + (1 if spot.is_available else -1)
+    for spot in session.deleted:
+        if isinstance(spot, ParkingSpot):
+            history = inspect(spot).attrs.is_available.history
+            was_available = history.deleted[0] if history.deleted else spot.is_available
+            if was_available:
+                deltas[spot.lot_id] = deltas.get(spot.lot_id, 0) - 1
+    if deltas:
+        adjust_available_spots(session.connection(), deltas)
@@ -0,0 +1,118 @@
+from applications.models import db, LotOccupancy, ParkingLot, OCCUPANCY_RESOLUTIONS, EPOCH, epoch_seconds
+from datetime import datetime, timedelta
+import numpy as np
+
+FINE, COARSE = OCCUPANCY_RESOLUTIONS
+# Fine samples are kept this long; steps that are not whole hours cannot reach further back
+FINE_RETENTION = timedelta(days=31)
+MAX_POINTS = 2000
+OCCUPANCY_SPAN = timedelta(hours=24)
+# Default step: the first of these that gives at most DEFAULT_POINTS points
+DEFAULT_STEPS = (FINE, 15 * 60, COARSE, 6 * 60 * 60, 24 * 60 * 60)
+DEFAULT_POINTS = 300
+
+def default_step(seconds):
+    return next((step for step in DEFAULT_STEPS if seconds / step <= DEFAULT_POINTS), DEFAULT_STEPS[-1])
+
+def _none_if_nan(values, digits=None):
+    return [None if np.isnan(value) else round(value, digits) for value in values.tolist()]
+
+def occupancy_series(lot_id, start, end, step=None, now=None):
+    """
+    Average, lowest and highest occupied spot count of a lot per `step` seconds over [start, end),
+    from the LotOccupancy samples alone: O(samples in range + points), independent of how many
+    reservations the lot has seen. Steps that are whole hours read the hourly samples. Buckets
+    before the lot's first sample, or still in the future, come back as null.
+    Returns None for an unknown lot; raises ValueError for a step or range it cannot serve.
+    """
+    capacity = db.session.query(ParkingLot.number_of_spots).filter(ParkingLot.id == lot_id).scalar()
+    if capacity is None:
+        return None
+    now = now or datetime.now()
+    now_s, start_s, end_s = epoch_seconds(now), epoch_seconds(start), epoch_seconds(end)
+    if step is None:
+        step = default_step(end_s - start_s)
+    if step <= 0 or step % FINE:
+        raise ValueError(f"step must be a positive multiple of {FINE} seconds")
+    resolution = COARSE if step % COARSE == 0 else FINE
+    first = start_s - start_s % step
+    points = -(-(end_s - first) // step)
+    if points > MAX_POINTS:
+        raise ValueError(f"At most {MAX_POINTS} points per request, use a larger step")
+    if resolution == FINE and first < epoch_seconds(now - FINE_RETENTION):
+        raise ValueError(f"Steps that are not whole hours only reach back {FINE_RETENTION.days} days")
+    last = first + points * step
+
+    samples = db.session.execute(
+        db.select(LotOccupancy.bucket, LotOccupancy.occupied, LotOccupancy.low, LotOccupancy.peak,
+                  LotOccupancy.occupied_seconds, LotOccupancy.last_change)
+        .where(LotOccupancy.lot_id == lot_id, LotOccupancy.resolution == resolution,
+               LotOccupancy.bucket >= first, LotOccupancy.bucket < last)
+        .order_by(LotOccupancy.bucket)
+    ).all()
+    carried = db.session.execute(
+        db.select(LotOccupancy.occupied)
+        .where(LotOccupancy.lot_id == lot_id, LotOccupancy.resolution == resolution, LotOccupancy.bucket < first)
+        .order_by(LotOccupancy.bucket.desc())
+        .limit(1)
+    ).scalar()
+    carried = np.nan if carried is None else float(carried)
+
+    # One cell per stored-resolution bucket; cells without a sample hold the count carried into them
+    cells = (last - first) // resolution
+    starts = first + resolution * np.arange(cells, dtype=np.int64)
+    buckets, occupied, low, peak, seconds, last_change = (
+        np.array(column, dtype=np.float64) for column in (zip(*samples) if samples else ((),) * 6)
+    )
+    index = ((buckets - first) // resolution).astype(np.int64)
+    after = np.full(cells, np.nan)
+    after[index] = occupied
+    latest = np.full(cells, -1, dtype=np.int64)
+    latest[index] = index
+    np.maximum.accumulate(latest, out=latest)
+    after = np.where(latest >= 0, after[np.maximum(latest, 0)], carried)
+    before = np.concatenate(([carried], after[:-1]))
+
+    elapsed = np.clip(now_s - starts, 0, resolution).astype(np.float64)
+    past = elapsed > 0
+    cell_seconds = np.where(past, before * elapsed, 0.0)
+    cell_low = np.where(past, before, np.nan)
+    cell_peak = cell_low.copy()
+    # A sampled cell: its stored integral, plus its last count up to the cell end (or now)
+    tail = np.clip(np.minimum(starts[index] + resolution, now_s) - last_change, 0, None)
+    cell_seconds[index] = seconds + occupied * tail
+    cell_low[index] = low
+    cell_peak[index] = peak
+
+    per_point = step // resolution
+    elapsed = elapsed.reshape(points, per_point).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(elapsed > 0, cell_seconds.reshape(points, per_point).sum(axis=1) / elapsed, np.nan)
+    return {
+        "lot_id": lot_id,
+        "capacity": capacity,
+        "step": step,
+        "resolution": resolution,
+        "buckets": [(EPOCH + timedelta(seconds=int(bucket))).isoformat() for bucket in range(first, last, step)],
+        "occupied_avg": _none_if_nan(average, 2),
+        "occupied_min": _none_if_nan(np.fmin.reduce(cell_low.reshape(points, per_point), axis=1)),
+        "occupied_max": _none_if_nan(np.fmax.reduce(cell_peak.reshape(points, per_point), axis=1)),
+        "utilization": _none_if_nan(average / capacity if capacity else np.full(points, np.nan), 4),
+    }
+
+def purge_fine_occupancy(now=None):
+    """
+    Drop fine samples older than FINE_RETENTION, keeping each lot's newest one before the cutoff
+    so the first bucket after it still knows its starting count.
+    """
+    cutoff = epoch_seconds((now or datetime.now()) - FINE_RETENTION)
+    table = LotOccupancy.__table__
+    older = table.alias()
+    newest_old = db.select(db.func.max(older.c.bucket)).where(
+        older.c.lot_id == table.c.lot_id, older.c.resolution == FINE, older.c.bucket < cutoff
+    ).scalar_subquery()
+    purged = db.session.execute(
+        table.delete().where(table.c.resolution == FINE, table.c.bucket < cutoff, table.c.bucket < newest_old)
+    ).rowcount
+    db.session.commit()
+    return purged
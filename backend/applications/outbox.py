@@ -0,0 +1,113 @@
+from applications.models import db, OutboxMessage
+from datetime import datetime, timedelta
+from tools.workers import celery
+import threading
+
+DISPATCH_BATCH_SIZE = 100
+# How long a dispatcher owns a message before another one may retry it
+LEASE = timedelta(seconds=60)
+POLL_SECONDS = 5
+MAX_BACKOFF = timedelta(minutes=10)
+
+def enqueue(task, *args):
+    """
+    Record a call to the Celery `task` in the current transaction. It is sent once the
+    transaction commits (call wake() after the commit), and is lost only if the change itself is.
+    """
+    db.session.add(OutboxMessage(task.name, list(args)))
+
+def _backoff(attempts):
+    return min(timedelta(seconds=2 ** attempts), MAX_BACKOFF)
+
+def dispatch_outbox(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Send due outbox messages to the broker. Each message is leased with a conditional UPDATE
+    first, so several dispatchers never send it at the same time; a dispatcher that dies
+    mid-send leaves the lease to expire and the message is retried (at-least-once).
+    Returns the number of messages sent.
+    """
+    now = datetime.now()
+    pending = (
+        db.session.query(OutboxMessage.id, OutboxMessage.task, OutboxMessage.args, OutboxMessage.attempts)
+        .filter(OutboxMessage.dispatched_at == None, OutboxMessage.available_at <= now)
+        .order_by(OutboxMessage.available_at, OutboxMessage.id)
+        .limit(batch_size)
+        .all()
+    )
+    db.session.rollback()
+
+    sent = 0
+    for message_id, task, args, attempts in pending:
+        leased = db.session.execute(
+            db.update(OutboxMessage)
+            .where(OutboxMessage.id == message_id, OutboxMessage.dispatched_at == None,
+                   OutboxMessage.available_at <= now)
+            .values(available_at=datetime.now() + LEASE)
+        )
+        db.session.commit()
+        if leased.rowcount != 1:
+            continue
+        try:
+            # retry=False: a broker outage fails fast here and is retried from the outbox.
+            # Nothing reads the results, so skip subscribing to the result backend.
+            celery.send_task(task, args=args, retry=False, ignore_result=True)
+        except Exception as e:
+            print(f"Warning: outbox message {message_id} ({task}) not sent: {e}")
+            db.session.execute(
+                db.update(OutboxMessage)
+                .where(OutboxMessage.id == message_id)
+                .values(attempts=attempts + 1, available_at=datetime.now() + _backoff(attempts + 1))
+            )
+            db.session.commit()
+            # The broker is most likely down; leave the rest for the next round
+            break
+        db.session.execute(
+            db.update(OutboxMessage).where(OutboxMessage.id == message_id).values(dispatched_at=datetime.now())
+        )
+        db.session.commit()
+        sent += 1
+    return sent
+
+class OutboxDispatcher:
+    """
+    Background thread that drains the outbox right after a commit (wake()) and every
+    POLL_SECONDS for anything left over, so requests never wait on the broker.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+
+    def wake(self):
+        if self._app is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(POLL_SECONDS)
+            self._wakeup.clear()
+            with self._app.app_context():
+                try:
+                    while dispatch_outbox() == DISPATCH_BATCH_SIZE:
+                        pass
+                except Exception as e:
+                    print(f"Warning: outbox dispatcher failed: {e}")
+                finally:
+                    db.session.remove()
+
+dispatcher = OutboxDispatcher()
+
+def init_outbox(app):
+    # With OUTBOX_DISPATCHER=off the outbox is only drained by the periodic Celery task
+    if app.config.get("OUTBOX_DISPATCHER") == "thread":
+        dispatcher.init_app(app)
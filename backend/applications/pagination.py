@@ -0,0 +1,124 @@
+from applications.models import db, ParkingSpot, ReservedParking
+from datetime import datetime
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+class PaginationError(ValueError):
+    """Bad cursor, limit or filter value in the query string (reported as 400)."""
+
+def page_limit(args):
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _cursor_value(column, value):
+    if isinstance(column.type, db.DateTime):
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+    elif isinstance(column.type, db.Integer):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    raise ValueError(f"bad cursor value for {column.key}")
+
+def decode_cursor(cursor, keys):
+    """Decode a cursor into one value per key column; anything else is a PaginationError."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("wrong cursor shape")
+        return [_cursor_value(col, v) for col, v in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+def parse_datetime(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"{name} must be an ISO date or datetime")
+
+def parse_int(args, name):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise PaginationError(f"{name} must be an integer")
+
+def parse_bool(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    return value.lower() in ("1", "true", "yes")
+
+def keyset_page(query, keys, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """
+    Return (rows, next_cursor) for one page of `query` ordered by the unique key `keys`.
+    Pages resume strictly after the last key seen, so cost does not grow with the page number.
+    """
+    key = db.tuple_(*keys) if len(keys) > 1 else keys[0]
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        after = db.tuple_(*values) if len(keys) > 1 else values[0]
+        query = query.filter(key < after if descending else key > after)
+
+    order = [k.desc() if descending else k.asc() for k in keys]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], k.key) for k in keys])
+    return rows, next_cursor
+
+def id_page(model, query, args, prefix=""):
+    """Keyset page on the primary key, reading `<prefix>cursor` and `limit` from the query string."""
+    return keyset_page(query, [model.id], args.get(f"{prefix}cursor"), page_limit(args))
+
+def filter_spots(query, args):
+    lot_id = parse_int(args, "lot_id")
+    if lot_id is not None:
+        query = query.filter(ParkingSpot.lot_id == lot_id)
+    available = parse_bool(args, "available")
+    if available is not None:
+        query = query.filter(ParkingSpot.is_available == available)
+    return query
+
+def filter_reservations(query, args):
+    """Apply the lot_id, active, from and to filters shared by the reservation listings."""
+    lot_id = parse_int(args, "lot_id")
+    if lot_id is not None:
+        query = query.filter(
+            ReservedParking.spot_id.in_(db.select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id))
+        )
+    if parse_bool(args, "active"):
+        query = query.filter(ReservedParking.exit_time == None)
+    start = parse_datetime(args, "from")
+    if start is not None:
+        query = query.filter(ReservedParking.park_time >= start)
+    end = parse_datetime(args, "to")
+    if end is not None:
+        query = query.filter(ReservedParking.park_time < end)
+    return query
+
+def reservation_page(query, args, prefix=""):
+    """Newest-first keyset page on (park_time, id)."""
+    return keyset_page(
+        filter_reservations(query, args),
+        [ReservedParking.park_time, ReservedParking.id],
+        args.get(f"{prefix}cursor"),
+        page_limit(args),
+        descending=True,
+    )
@@ -0,0 +1,70 @@
+from flask_bcrypt import Bcrypt
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+bcrypt = Bcrypt()
+
+# Hashes waiting for or running in the pool, per worker thread, before new ones are turned away
+PENDING_PER_WORKER = 4
+# Seconds a request waits for a pool slot before giving up
+SLOT_WAIT_SECONDS = 5
+
+class PasswordHasherBusy(Exception):
+    """Every pool slot stayed taken for SLOT_WAIT_SECONDS; the caller should answer 503."""
+
+class PasswordHasher:
+    """
+    bcrypt runs on a small thread pool (bcrypt releases the GIL while hashing), so at most
+    `workers` hashes burn CPU at once and a burst of logins queues here instead of
+    starving every other request of the worker's CPU.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(workers * PENDING_PER_WORKER)
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=SLOT_WAIT_SECONDS):
+            raise PasswordHasherBusy()
+        try:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._submit(bcrypt.generate_password_hash, password).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        return self._submit(bcrypt.check_password_hash, pw_hash, password)
+
+hasher = PasswordHasher()
+
+# Cost and algorithm new hashes are made with; flask_bcrypt's defaults until init_passwords runs
+log_rounds = 12
+hash_prefix = "2b"
+
+def init_passwords(app):
+    global hasher, log_rounds, hash_prefix
+    bcrypt.init_app(app)
+    log_rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+    hash_prefix = app.config.get("BCRYPT_HASH_PREFIX", "2b")
+    hasher = PasswordHasher(app.config["PASSWORD_HASH_WORKERS"])
+
+def hash_password(password):
+    return hasher.hash(password)
+
+def check_password(pw_hash, password):
+    return hasher.check(pw_hash, password)
+
+def needs_rehash(pw_hash):
+    """True when a stored "$2b$<rounds>$..." hash was made with another cost or prefix than configured."""
+    try:
+        _, prefix, rounds, _ = pw_hash.split("$", 3)
+        return prefix != hash_prefix or int(rounds) != log_rounds
+    except ValueError:
+        return True
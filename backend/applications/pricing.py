@@ -0,0 +1,199 @@
+from applications.models import db, ParkingLot, ParkingSpot, ReservedParking
+from collections import namedtuple
+from datetime import datetime
+import math
+import numpy as np
+
+DAY = 24 * 60 * 60
+EPOCH = datetime(1970, 1, 1)
+RECOMPUTE_BATCH_SIZE = 100_000
+
+# rate: price per hour outside any band (the lot's price)
+# daily_cap: most one stay pays per 24 hours from its park time, None for no cap
+# bands: ((start_second, end_second, rate), ...) time-of-day windows with their own hourly rate
+Tariff = namedtuple("Tariff", ["rate", "daily_cap", "bands"])
+
+def _seconds(value):
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time of day: {value}")
+    return (hours * 60 + minutes) * 60
+
+def parse_price(value):
+    """Validate a lot's hourly price; NaN and infinities are rejected like negative prices."""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("Price must be a number")
+    if not math.isfinite(price):
+        raise ValueError("Price must be a finite number")
+    if price < 0:
+        raise ValueError("Price cannot be negative")
+    return price
+
+def parse_daily_cap(value):
+    if value is None:
+        return None
+    cap = float(value)
+    # NaN passes a `< 0` check and would poison every np.minimum over the lot's costs
+    if not math.isfinite(cap):
+        raise ValueError("daily_cap must be a finite number")
+    if cap < 0:
+        raise ValueError("daily_cap cannot be negative")
+    return cap
+
+def parse_bands(value):
+    """
+    Validate admin input: a list of {"start": "HH:MM", "end": "HH:MM", "price": hourly}.
+    A band with end before start runs over midnight. Returns the list to store, or None.
+    """
+    if not value:
+        return None
+    bands = []
+    covered = []
+    for band in value:
+        try:
+            start, end, price = _seconds(band["start"]), _seconds(band["end"]), float(band["price"])
+        except (KeyError, TypeError, AttributeError, ValueError):
+            raise ValueError('Each tariff band needs "start" and "end" as HH:MM and a numeric "price"')
+        if not math.isfinite(price):
+            raise ValueError("Band price must be a finite number")
+        if price < 0:
+            raise ValueError("Band price cannot be negative")
+        if start == end:
+            raise ValueError("A tariff band cannot be empty")
+        covered.extend([(start, end)] if start < end else [(start, DAY), (0, end)])
+        bands.append({"start": band["start"], "end": band["end"], "price": price})
+    covered.sort()
+    if any(a_end > b_start for (_, a_end), (b_start, _) in zip(covered, covered[1:])):
+        raise ValueError("Tariff bands overlap")
+    return bands
+
+def tariff(price, daily_cap=None, tariff_bands=None):
+    bands = []
+    for band in tariff_bands or ():
+        start, end = _seconds(band["start"]), _seconds(band["end"])
+        if start < end:
+            bands.append((start, end, band["price"]))
+        else:
+            bands.extend([(start, DAY, band["price"]), (0, end, band["price"])])
+    return Tariff(price, daily_cap, tuple(sorted(bands)))
+
+def load_tariffs(lot_ids=None):
+    """{lot_id: Tariff} for the given lots (all lots when None), in one query."""
+    query = db.session.query(ParkingLot.id, ParkingLot.price, ParkingLot.daily_cap, ParkingLot.tariff_bands)
+    if lot_ids is not None:
+        query = query.filter(ParkingLot.id.in_(lot_ids))
+    return {lot_id: tariff(price, cap, bands) for lot_id, price, cap, bands in query}
+
+def _day_curve(t):
+    """Breakpoints (seconds since midnight) and the cumulative charge at each one."""
+    edges = [0]
+    rates = []
+    for start, end, rate in t.bands:
+        if start > edges[-1]:
+            rates.append(t.rate)
+            edges.append(start)
+        rates.append(rate)
+        edges.append(end)
+    if edges[-1] < DAY:
+        rates.append(t.rate)
+        edges.append(DAY)
+    edges = np.array(edges, dtype=np.float64)
+    charges = np.concatenate(([0.0], np.cumsum(np.diff(edges) / 3600 * np.array(rates))))
+    return edges, charges
+
+def _epoch_seconds(times):
+    if isinstance(times, np.ndarray) and times.dtype.kind == "M":
+        return (times.astype("datetime64[us]") - np.datetime64(0, "us")) / np.timedelta64(1, "s")
+    # Much faster than numpy's own datetime -> datetime64 conversion of Python objects
+    return np.fromiter(((t - EPOCH).total_seconds() for t in times), dtype=np.float64, count=len(times))
+
+def batch_costs(park_times, exit_times, lot_ids, tariffs):
+    """
+    Charges for many stays at once: `park_times`/`exit_times` are datetimes (or datetime64 arrays),
+    `lot_ids` the lot of each stay and `tariffs` {lot_id: Tariff}. Returns a float array in cents
+    precision. Lots without bands are priced in one pass; banded lots take one np.interp over their own rows.
+    """
+    park = _epoch_seconds(park_times)
+    leave = np.maximum(_epoch_seconds(exit_times), park)
+    lot_ids = np.asarray(lot_ids, dtype=np.int64)
+
+    known = np.array(sorted(tariffs), dtype=np.int64)
+    if not np.isin(lot_ids, known).all():
+        raise KeyError("batch_costs: no tariff for some lot_ids")
+    index = np.searchsorted(known, lot_ids)
+    ordered = [tariffs[lot_id] for lot_id in known.tolist()]
+    rate = np.array([t.rate for t in ordered], dtype=np.float64)[index]
+    cap = np.array([np.inf if t.daily_cap is None else t.daily_cap for t in ordered], dtype=np.float64)[index]
+
+    # Whole 24h periods contain every time of day once, so each one costs the full-day charge
+    full_days = np.floor((leave - park) / DAY)
+    start = park + full_days * DAY
+    start_tod, leave_tod = np.mod(start, DAY), np.mod(leave, DAY)
+    wraps = np.floor(leave / DAY) - np.floor(start / DAY)
+
+    day_charge = rate * 24
+    start_charge = rate * start_tod / 3600
+    leave_charge = rate * leave_tod / 3600
+    banded = [position for position, t in enumerate(ordered) if t.bands]
+    if banded:
+        # Stays grouped by lot with one sort, so each banded lot only touches its own rows
+        by_lot = np.argsort(index, kind="stable")
+        bounds = np.searchsorted(index[by_lot], np.arange(len(ordered) + 1))
+    for position in banded:
+        members = by_lot[bounds[position]:bounds[position + 1]]
+        if not len(members):
+            continue
+        edges, charges = _day_curve(ordered[position])
+        day_charge[members] = charges[-1]
+        start_charge[members] = np.interp(start_tod[members], edges, charges)
+        leave_charge[members] = np.interp(leave_tod[members], edges, charges)
+
+    remainder = wraps * day_charge + leave_charge - start_charge
+    cost = full_days * np.minimum(day_charge, cap) + np.minimum(remainder, cap)
+    return np.round(cost, 2)
+
+def reservation_cost(t, park_time, exit_time):
+    """Charge for one stay under Tariff `t`; the same arithmetic as batch_costs."""
+    return float(batch_costs([park_time], [exit_time], [0], {0: t})[0])
+
+def recompute_costs(since=None, until=None, lot_id=None, batch_size=RECOMPUTE_BATCH_SIZE, echo=print):
+    """
+    Reprice closed reservations (exit_time in [since, until), optionally one lot) with the current
+    tariffs, `batch_size` rows per read + executemany UPDATE + commit. Returns the number of rows.
+    """
+    tariffs = load_tariffs()
+    query = (
+        db.select(ReservedParking.id, ParkingSpot.lot_id, ReservedParking.park_time, ReservedParking.exit_time)
+        .join(ParkingSpot, ParkingSpot.id == ReservedParking.spot_id)
+        .where(ReservedParking.exit_time != None)
+        .order_by(ReservedParking.id)
+        .limit(batch_size)
+    )
+    if since is not None:
+        query = query.where(ReservedParking.exit_time >= since)
+    if until is not None:
+        query = query.where(ReservedParking.exit_time < until)
+    if lot_id is not None:
+        query = query.where(ParkingSpot.lot_id == lot_id)
+
+    # Core executemany; the ORM bulk-update-by-primary-key path costs several times more per row
+    table = ReservedParking.__table__
+    update = table.update().where(table.c.id == db.bindparam("b_id")).values(total_cost=db.bindparam("b_cost"))
+
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(ReservedParking.id > last_id)).all()
+        if not rows:
+            break
+        ids, lot_ids, park_times, exit_times = zip(*rows)
+        costs = batch_costs(park_times, exit_times, lot_ids, tariffs)
+        db.session.execute(update, [{"b_id": res_id, "b_cost": cost} for res_id, cost in zip(ids, costs.tolist())])
+        db.session.commit()
+        count += len(rows)
+        last_id = ids[-1]
+        echo(f"repriced {count} reservations")
+    return count
@@ -1,14 +1,29 @@
-from flask import request, jsonify, render_template
+from flask import request, jsonify, render_template, Response, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity, unset_jwt_cookies
 from applications.models import *
-from applications import app, db, bcrypt
+from applications import app, db
 from applications.auth_utils import admin_required, user_required
+from applications.cache_utils import cache, cache_stats, cached_response, invalidate
+from applications.allocator import allocator
+from applications.search import page_args, search_users, search_lots, search_reservations
+from applications.pagination import PaginationError, id_page, reservation_page, filter_spots, filter_reservations, parse_int, parse_datetime
+from applications.exports import reservation_export_query, iter_export_rows, stream_csv, stream_ndjson
+from applications.spot_maps import spot_maps
+from applications import live, outbox
+from applications.idempotency import idempotent, remember_response
+from applications.user_context import current_user, forget_user
+from applications.passwords import PasswordHasherBusy, check_password, hash_password, needs_rehash
+from applications.pricing import parse_bands, parse_daily_cap, parse_price, reservation_cost, tariff
+from applications.analytics import STATS_SPAN, usage_stats
+from applications.occupancy import OCCUPANCY_SPAN, occupancy_series
+from applications.serializers import (
+    locations_with_lots, row_query, rows_to_dicts, LOT_COLUMNS, SPOT_COLUMNS, RESERVATION_COLUMNS, USER_COLUMNS
+)
 from tools import tasks
-from flask_caching import Cache
 
-cache = Cache(app)
-
-#@cache.cached(timeout=10)
+@app.errorhandler(PaginationError)
+def handle_pagination_error(e):
+    return jsonify({"message": str(e)}), 400
 
 @app.route("/", methods=["GET"])
 def index():
@@ -26,10 +41,14 @@ def register():
     if User.query.filter_by(username=username).first() or User.query.filter_by(email=email).first():
         return jsonify({"message": "User already exists"}), 400
     
-    user = User(name=name, username=username, email=email, password=password)
+    try:
+        user = User(name=name, username=username, email=email, password=password)
+    except PasswordHasherBusy:
+        return jsonify({"message": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
     try:
         db.session.add(user)
         db.session.commit()
+        invalidate("users")
         return jsonify({"message": "User registered successfully"}), 201
     except Exception as e:
         db.session.rollback()
@@ -47,10 +66,19 @@ def login():
     
     user = User.query.filter_by(username=username).first()
 
-    if user and bcrypt.check_password_hash(user.password, password):
+    try:
+        valid = user is not None and check_password(user.password, password)
+        if valid and needs_rehash(user.password):
+            # Configured cost changed since this hash was made; upgrade it while we have the plaintext
+            user.password = hash_password(password)
+    except PasswordHasherBusy:
+        return jsonify({"message": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
+
+    if valid:
         # ✅ Update last_login time
         user.last_login = datetime.now()
         db.session.commit()
+        invalidate("users")
 
         access_token = create_access_token(
             identity=str(user.id),
@@ -95,38 +123,52 @@ def logout():
     unset_jwt_cookies(response)
     return response, 200
 
-@cache.cached(timeout=60*60)
 @app.route("/get_locations", methods=["GET"])
+# Each lot carries its live available_spots counter, so bookings and releases ("spots") invalidate too
+@cached_response(timeout=60*60, namespaces=("locations", "lots", "spots"))
 def get_locations():
-    locations = Location.query.all()
-    return jsonify({"locations": [loc.to_dict() for loc in locations]}), 200
+    return jsonify({"locations": locations_with_lots()}), 200
+
+def spot_listing(lots):
+    """
+    Spots for a listing response: a page of spot objects, or with ?format=columnar one compact
+    bitmap per lot on the page (or for ?lot_id=) with no spots cursor.
+    """
+    if request.args.get("format") == "columnar":
+        lot_id = parse_int(request.args, "lot_id")
+        lot_ids = [lot_id] if lot_id is not None else [lot.id for lot in lots]
+        return {"spot_maps": spot_maps(lot_ids)}, None
+    spots, next_spots = id_page(ParkingSpot, filter_spots(row_query(SPOT_COLUMNS), request.args), request.args, "spots_")
+    return {"spots": rows_to_dicts(spots)}, next_spots
 
-@cache.cached(timeout=60*60)
 @app.route("/get_lots", methods=["GET"])
 @jwt_required()
+@cached_response(timeout=60*60, namespaces=("lots", "spots"), query_string=True)
 def get_lots():
-    lots = ParkingLot.query.all()
-    spots = ParkingSpot.query.all()
+    lots, next_lots = id_page(ParkingLot, row_query(LOT_COLUMNS), request.args, "lots_")
+    spot_fields, next_spots = spot_listing(lots)
     return jsonify({
-        "lots": [lot.to_dict() for lot in lots],
-        "spots": [spot.to_dict() for spot in spots]
+        "lots": rows_to_dicts(lots),
+        **spot_fields,
+        "next_cursors": {"lots": next_lots, "spots": next_spots}
     }), 200
 
 ##################################################################################
 ############################CRUD on Admin Dashboard###############################
 ##################################################################################
 
-@cache.cached(timeout=60*60)
 @app.route("/parking_lots", methods=["GET"])
 @admin_required
+@cached_response(timeout=60*60, namespaces=("lots", "spots", "reservations"), query_string=True)
 def parking_lots():
-    lots = ParkingLot.query.all()
-    spots = ParkingSpot.query.all()
-    reservedSpots = ReservedParking.query.all()
+    lots, next_lots = id_page(ParkingLot, row_query(LOT_COLUMNS), request.args, "lots_")
+    spot_fields, next_spots = spot_listing(lots)
+    reservedSpots, next_reservations = reservation_page(row_query(RESERVATION_COLUMNS), request.args, "reservations_")
     return jsonify({
-        "lots": [lot.to_dict() for lot in lots],
-        "spots": [spot.to_dict() for spot in spots],
-        "reservedSpots": [reservedSpot.to_dict() for reservedSpot in reservedSpots]
+        "lots": rows_to_dicts(lots),
+        **spot_fields,
+        "reservedSpots": rows_to_dicts(reservedSpots),
+        "next_cursors": {"lots": next_lots, "spots": next_spots, "reservations": next_reservations}
     }), 200
 
 @app.route("/add_location", methods=["POST"])
@@ -142,6 +184,7 @@ def add_location():
         return jsonify({"message": "Location already exists"}), 400
     db.session.add(loc)
     db.session.commit()
+    invalidate("locations")
     return jsonify({"message": "Location added successfully"}), 201
 
 @app.route("/delete_location/<int:location_id>", methods=["DELETE"])
@@ -150,8 +193,12 @@ def delete_location(location_id):
     loc = Location.query.get(location_id)
     if not loc:
         return jsonify({"message": "Location not found"}), 404
+    # Lots, spots and their reservations cascade in the database (ON DELETE CASCADE)
     db.session.delete(loc)
     db.session.commit()
+    invalidate("locations", "lots", "spots", "reservations", "spotmaps")
+    live.publish_resync()
+    allocator.forget()
     return jsonify({"message": "Location deleted successfully"}), 200
 
 @app.route("/add_parking_lot", methods=["POST"])
@@ -159,14 +206,22 @@ def delete_location(location_id):
 def add_parking_lot():
     data = request.get_json()
     name = data.get("prime_location_name")
-    price = data.get("price")
     address = data.get("address")
     pin_code = data.get("pin_code")
     number_of_spots = data.get("number_of_spots")
     location_id = data.get("location_id")
     if not Location.query.get(location_id):
         return jsonify({"message": "Invalid location ID"}), 400
-    lot = ParkingLot(name, price, address, pin_code, number_of_spots)
+    try:
+        price = parse_price(data.get("price"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        daily_cap = parse_daily_cap(data.get("daily_cap"))
+        tariff_bands = parse_bands(data.get("tariff_bands"))
+    except (ValueError, TypeError) as e:
+        return jsonify({"message": f"Invalid tariff: {e}"}), 400
+    lot = ParkingLot(name, price, address, pin_code, number_of_spots, daily_cap, tariff_bands)
     lot.location_id = location_id
     #Check if lot already exists
     if ParkingLot.query.filter_by(prime_location_name=name).first():
@@ -179,6 +234,7 @@ def add_parking_lot():
         spots = [ParkingSpot(lot_id=lot.id) for _ in range(number_of_spots)]
         db.session.add_all(spots)
         db.session.commit()
+        invalidate("lots", "spots")
         return jsonify({"message": "Parking lot added successfully"}), 201
 
 @app.route("/update_parking_lot/<int:lot_id>", methods=["POST"])
@@ -197,64 +253,83 @@ def update_parking_lot(lot_id):
         new_number_of_spots = int(data["number_of_spots"])
         if new_number_of_spots < 0:
             return jsonify({"message": "Number of spots cannot be negative"}), 400
-        new_price = float(data["price"])
-        if new_price < 0:
-            return jsonify({"message": "Price cannot be negative"}), 400
     except (ValueError, TypeError):
-        return jsonify({"message": "Invalid data type for price or number_of_spots"}), 400
+        return jsonify({"message": "Invalid data type for number_of_spots"}), 400
+    try:
+        new_price = parse_price(data["price"])
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Tariff rules are optional; leaving them out keeps the lot's current ones
+    try:
+        if "daily_cap" in data:
+            lot.daily_cap = parse_daily_cap(data["daily_cap"])
+        if "tariff_bands" in data:
+            lot.tariff_bands = parse_bands(data["tariff_bands"])
+    except (ValueError, TypeError) as e:
+        return jsonify({"message": f"Invalid tariff: {e}"}), 400
 
     lot.prime_location_name = data["prime_location_name"]
     lot.price = new_price
     lot.address = data["address"]
     lot.pin_code = data["pin_code"]
     lot.number_of_spots = new_number_of_spots
-    
-    db.session.commit()
-
 
+    # The lot update and the spot changes go out in one transaction
     if new_number_of_spots > previous_number_of_spots:
-        spots_to_add = [ParkingSpot(lot_id=lot.id)
-                        for _ in range(new_number_of_spots - previous_number_of_spots)]
-        db.session.add_all(spots_to_add)
+        num_to_add = new_number_of_spots - previous_number_of_spots
+        db.session.execute(
+            ParkingSpot.__table__.insert(),
+            [{"lot_id": lot.id, "is_available": True} for _ in range(num_to_add)]
+        )
+        # Core inserts bypass the ORM flush listener, so adjust the counter here
+        adjust_available_spots(db.session.connection(), {lot.id: num_to_add})
         db.session.commit()
+        invalidate("lots", "spots", f"lot:{lot.id}")
+        live.publish_resync(lot.id)
+        allocator.forget(lot.id)
         return jsonify({"message": "Parking lot and new spots added successfully"}), 200
 
     elif new_number_of_spots < previous_number_of_spots:
         num_to_delete = previous_number_of_spots - new_number_of_spots
 
-        all_spots_in_lot = ParkingSpot.query.filter_by(lot_id=lot.id).order_by(ParkingSpot.id.desc()).all()
-        
         current_utc_time = datetime.now()
+        active_reservation = db.exists().where(
+            ReservedParking.spot_id == ParkingSpot.id,
+            (ReservedParking.exit_time == None) | (ReservedParking.exit_time > current_utc_time)
+        )
+        # Highest-id free spots with no active reservation, selected and deleted in one statement.
+        # Their reservation history goes with them through the ON DELETE CASCADE foreign key.
+        deletable_spots = (
+            db.select(ParkingSpot.id)
+            .where(ParkingSpot.lot_id == lot.id, ParkingSpot.is_available == True, ~active_reservation)
+            .order_by(ParkingSpot.id.desc())
+            .limit(num_to_delete)
+        )
+        result = db.session.execute(
+            db.delete(ParkingSpot)
+            .where(ParkingSpot.id.in_(deletable_spots))
+            .execution_options(synchronize_session=False)
+        )
 
-        deletable_spots = []
-        for spot in all_spots_in_lot:
-            if not spot.is_available:
-                continue
-
-            active_reservation_exists = ReservedParking.query.filter(
-                ReservedParking.spot_id == spot.id,
-                (ReservedParking.exit_time == None) | (ReservedParking.exit_time > current_utc_time)
-            ).first()
-
-            if not active_reservation_exists:
-                deletable_spots.append(spot)
-
-        if num_to_delete > len(deletable_spots):
-            db.session.rollback() 
+        if result.rowcount < num_to_delete:
+            db.session.rollback()
+            spots_in_lot = ParkingSpot.query.filter_by(lot_id=lot_id).count()
             return jsonify({
                 "message": (f"Cannot reduce spots to {new_number_of_spots}. "
-                            f"There are {len(all_spots_in_lot) - len(deletable_spots)} spots with active reservations "
+                            f"There are {spots_in_lot - result.rowcount} spots with active reservations "
                             "that cannot be deleted.")
             }), 400
-        
-        spots_to_remove = deletable_spots[:num_to_delete]
 
-        for spot in spots_to_remove:
-            db.session.delete(spot)
-        
+        adjust_available_spots(db.session.connection(), {lot.id: -result.rowcount})
         db.session.commit()
+        invalidate("lots", "spots", f"lot:{lot.id}")
+        live.publish_resync(lot.id)
+        allocator.forget(lot.id)
         return jsonify({"message": "Parking lot and spots reduced successfully"}), 200
 
+    db.session.commit()
+    invalidate("lots", "spots")
     return jsonify({"message": "Parking lot updated successfully"}), 200
 
 @app.route("/delete_parking_lot/<int:lot_id>", methods=["DELETE"])
@@ -262,22 +337,31 @@ def update_parking_lot(lot_id):
 def delete_parking_lot(lot_id):
     #Check if any spot inside the parking lot is reserved
     lot = ParkingLot.query.get_or_404(lot_id)
-    for spot in lot.spots:
-        if ReservedParking.query.filter_by(spot_id=spot.id).first():
-            return jsonify({"message": "Cannot delete lot with reserved spots"}), 400
+    has_reservations = db.session.query(
+        db.exists().where(ReservedParking.spot_id == ParkingSpot.id, ParkingSpot.lot_id == lot_id)
+    ).scalar()
+    if has_reservations:
+        return jsonify({"message": "Cannot delete lot with reserved spots"}), 400
     
     if not lot:
         return jsonify({"message": "Parking lot not found"}), 404
+    # Spots are removed by the ON DELETE CASCADE foreign key, not loaded and deleted one by one
     db.session.delete(lot)
     db.session.commit()
+    invalidate("lots", "spots", "reservations", f"lot:{lot_id}")
+    live.publish_resync(lot_id)
+    allocator.forget(lot_id)
     return jsonify({"message": "Parking lot deleted successfully"}), 200
 
-@cache.cached(timeout=60*60)
 @app.route("/get_users", methods=["GET"])
 @admin_required
+@cached_response(timeout=60*60, namespaces=("users",), query_string=True)
 def get_users():
-    users = User.query.filter_by(admin=False).all()
-    return jsonify({"users": [user.to_dict() for user in users]}), 200
+    users, next_users = id_page(User, row_query(USER_COLUMNS).filter(User.admin == False), request.args, "users_")
+    return jsonify({
+        "users": rows_to_dicts(users),
+        "next_cursors": {"users": next_users}
+    }), 200
 
 @app.route("/delete_user/<int:user_id>", methods=["DELETE"])
 @admin_required
@@ -287,14 +371,18 @@ def delete_user(user_id):
         return jsonify({"message": "User not found"}), 404
     db.session.delete(user)
     db.session.commit()
+    forget_user(user_id)
+    invalidate("users", "spots", "reservations", "spotmaps", f"user:{user_id}")
+    live.publish_resync()
+    allocator.forget()
     return jsonify({"message": "User deleted successfully"}), 200
 
-@cache.cached(timeout=60*60)
 @app.route('/search', methods=['GET'])
 @admin_required
+@cached_response(timeout=60*60, namespaces=("users", "lots", "reservations"), query_string=True)
 def admin_search():
-    query = request.args.get('q', '').lower()
-    users, lots, reservations = [], [], []
+    query = request.args.get('q', '').strip().lower()
+    limit, offset = page_args(request.args)
 
     # Helper function to format cost (DRY principle)
     def format_cost(cost_value):
@@ -302,97 +390,88 @@ def admin_search():
             return f"{float(cost_value):.2f}" # Pythonic way to format float to 2 decimal places
         return cost_value # Return as is if not a number (e.g., None, string)
 
-    # If query = "all", return all users, lots, and reservations
-    if query == "all":
-        for user in User.query.filter_by(admin=False).all():
-            users.append({
-                "ID": user.id,
-                "Name": user.name,
-                "Username": user.username,
-                "Email": user.email
-            })
-        for lot in ParkingLot.query.all():
-            lots.append({
-                "ID": lot.id,
-                "Location": lot.prime_location_name,
-                "Address": lot.address,
-                "Pin": lot.pin_code,
-                "Price": lot.price
-            })
-        for res in ReservedParking.query.all():
-            reservations.append({
-                "ID": res.id,
-                "User ID": res.user_id,
-                "Spot ID": res.spot_id,
-                "Park Time": res.park_time.strftime("%Y-%m-%d %H:%M") if res.park_time else "N/A",
-                "Exit Time": res.exit_time.strftime("%Y-%m-%d %H:%M") if res.exit_time else "N/A",
-                "Total Cost": format_cost(res.total_cost) # ⭐ FIXED HERE ⭐
-            })
-        return jsonify({"users": users, "lots": lots, "reservations": reservations}), 200
-
-    # Search for specific queries
-    for user in User.query.filter_by(admin=False).all():
-        if query in user.name.lower() or query in user.username.lower() or query in user.email.lower():
-            users.append({
-                "ID": user.id,
-                "Name": user.name,
-                "Username": user.username,
-                "Email": user.email
-            })
-
-    for lot in ParkingLot.query.all():
-        if query in lot.prime_location_name.lower() or query in lot.address.lower() or query in str(lot.pin_code):
-            lots.append({
-                "ID": lot.id,
-                "Location": lot.prime_location_name,
-                "Address": lot.address,
-                "Pin": lot.pin_code,
-                "Price": lot.price
-            })
-
-    for res in ReservedParking.query.all():
-        if query in str(res.user_id) or query in str(res.spot_id) or query in str(res.id):
-            reservations.append({
-                "ID": res.id,
-                "User ID": res.user_id,
-                "Spot ID": res.spot_id,
-                "Park Time": res.park_time.strftime("%Y-%m-%d %H:%M") if res.park_time else "N/A",
-                "Exit Time": res.exit_time.strftime("%Y-%m-%d %H:%M") if res.exit_time else "N/A",
-                "Total Cost": format_cost(res.total_cost) # ⭐ FIXED HERE ⭐
-            })
+    # Matching runs in SQL (FTS5 / indexed prefixes / exact ids); "all" just pages through everything
+    users = [{
+        "ID": user.id,
+        "Name": user.name,
+        "Username": user.username,
+        "Email": user.email
+    } for user in search_users(query, limit, offset)]
+
+    lots = [{
+        "ID": lot.id,
+        "Location": lot.prime_location_name,
+        "Address": lot.address,
+        "Pin": lot.pin_code,
+        "Price": lot.price
+    } for lot in search_lots(query, limit, offset)]
+
+    reservations = [{
+        "ID": res.id,
+        "User ID": res.user_id,
+        "Spot ID": res.spot_id,
+        "Park Time": res.park_time.strftime("%Y-%m-%d %H:%M") if res.park_time else "N/A",
+        "Exit Time": res.exit_time.strftime("%Y-%m-%d %H:%M") if res.exit_time else "N/A",
+        "Total Cost": format_cost(res.total_cost) # ⭐ FIXED HERE ⭐
+    } for res in search_reservations(query, limit, offset)]
 
     return jsonify({
         "users": users,
         "lots": lots,
-        "reservations": reservations
-    })
+        "reservations": reservations,
+        "limit": limit,
+        "offset": offset
+    }), 200
 
 @app.route("/admin_summary", methods=["GET"])
 @admin_required
 def admin_summary():
-    lots = ParkingLot.query.all()
-    spots = ParkingSpot.query.all()
-    reservations = ReservedParking.query.all()
-    users = User.query.filter_by(admin=False).all()
+    lots, next_lots = id_page(ParkingLot, row_query(LOT_COLUMNS), request.args, "lots_")
+    spot_fields, next_spots = spot_listing(lots)
+    reservations, next_reservations = reservation_page(row_query(RESERVATION_COLUMNS), request.args, "reservations_")
+    users, next_users = id_page(User, row_query(USER_COLUMNS).filter(User.admin == False), request.args, "users_")
     return jsonify({
-        "lots": [lot.to_dict() for lot in lots],
-        "spots": [spot.to_dict() for spot in spots],
-        "reservations": [res.to_dict() for res in reservations],
-        "users": [user.to_dict() for user in users]
+        "lots": rows_to_dicts(lots),
+        **spot_fields,
+        "reservations": rows_to_dicts(reservations),
+        "users": rows_to_dicts(users),
+        "next_cursors": {
+            "lots": next_lots,
+            "spots": next_spots,
+            "reservations": next_reservations,
+            "users": next_users
+        }
     })
 
+@app.route("/admin_summary/stats", methods=["GET"])
+@admin_required
+@cached_response(timeout=60*60, namespaces=("analytics", "lots", "spots"), query_string=True)
+def admin_summary_stats():
+    # Charts from the rollup tables (tools.tasks.rollup_usage_stats) instead of raw rows
+    grain = request.args.get("grain", "day")
+    if grain not in STATS_SPAN:
+        return jsonify({"message": "grain must be hour or day"}), 400
+    end = parse_datetime(request.args, "to") or datetime.now()
+    start = parse_datetime(request.args, "from") or end - STATS_SPAN[grain]
+    if start >= end:
+        return jsonify({"message": "from must be before to"}), 400
+    try:
+        return jsonify(usage_stats(grain, start, end)), 200
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
 ##################################################################################
 ############################CRUD on User Dashboard################################
 ##################################################################################
 
-@cache.cached(timeout=60*60)
 @app.route("/get_spots_in_lot/<int:lot_id>", methods=["GET"])
 @user_required
+@cached_response(timeout=60*60, namespaces=("spots",))
 def get_spots_in_lot(lot_id):
     try:
-        spots = ParkingSpot.query.filter_by(lot_id=lot_id).all()
+        spots = row_query(SPOT_COLUMNS).filter(ParkingSpot.lot_id == lot_id).order_by(ParkingSpot.id).all()
         return jsonify({
-            "spots": [spot.to_dict() for spot in spots]
+            "spots": rows_to_dicts(spots)
         }), 200
     except Exception as e:
         return jsonify({"error": "Could not retrieve spots", "details": str(e)}), 500
@@ -402,6 +481,7 @@ from datetime import datetime
 
 @app.route("/reserve_spot/<int:spot_id>", methods=["POST"])
 @user_required
+@idempotent
 def reserve_spot(spot_id):
     user_id = get_jwt_identity()
 
@@ -413,25 +493,59 @@ def reserve_spot(spot_id):
     if not spot.is_available:
         return jsonify({"message": "Spot already reserved"}), 400
 
-    # Reserve and update
-    reserved_parking = ReservedParking(user_id, spot_id, park_time, None, None)
-    spot.is_available = False
+    # Claim with a conditional UPDATE so two concurrent requests cannot both book the spot
+    if not allocator.claim_spot(spot.lot_id, spot_id):
+        db.session.rollback()
+        return jsonify({"message": "Spot already reserved"}), 400
 
-    db.session.add(reserved_parking)
-    db.session.commit()
+    return book_spot(user_id, spot.lot_id, spot_id, park_time)
 
-    # Store the reservation ID in reservation_id
-    reservation_id = reserved_parking.id
-    
-    tasks.send_reservation_email.delay(reservation_id)
+@app.route("/reserve_in_lot/<int:lot_id>", methods=["POST"])
+@user_required
+@idempotent
+def reserve_in_lot(lot_id):
+    user_id = get_jwt_identity()
+    park_time = datetime.now()
 
-    return jsonify({
+    ParkingLot.query.get_or_404(lot_id)
+
+    # Server-side allocation of the first available spot in the lot
+    spot_id = allocator.claim(lot_id)
+    if spot_id is None:
+        db.session.rollback()
+        return jsonify({"message": "No spots available in this lot"}), 400
+
+    try:
+        return book_spot(user_id, lot_id, spot_id, park_time)
+    except Exception:
+        db.session.rollback()
+        allocator.release(lot_id, spot_id)
+        raise
+
+def book_spot(user_id, lot_id, spot_id, park_time):
+    # The spot has already been claimed in this transaction, only the reservation is left
+    reserved_parking = ReservedParking(int(user_id), spot_id, park_time, None, None)
+
+    db.session.add(reserved_parking)
+    db.session.flush()
+
+    # The email, the stored idempotent response and the reservation commit together
+    outbox.enqueue(tasks.send_reservation_email, reserved_parking.id)
+    body = {
         "message": "Spot reserved successfully",
         "reservation": reserved_parking.to_dict()
-    }), 200
+    }
+    remember_response(body, 200)
+    db.session.commit()
+    invalidate("spots", "reservations", f"lot:{lot_id}", f"user:{user_id}")
+    live.publish_spot(lot_id, spot_id, False)
+    outbox.dispatcher.wake()
+
+    return jsonify(body), 200
 
 @app.route("/release_parking/<int:reservation_id>", methods=["POST"])
 @user_required
+@idempotent
 def release_parking(reservation_id):
     if request.method == "OPTIONS":
         return jsonify({"message": "Success"}), 200
@@ -440,125 +554,186 @@ def release_parking(reservation_id):
     if user_id is None:
         return jsonify({"message": "User not found"}), 404
     
-    reservation = ReservedParking.query.get_or_404(reservation_id)
+    # Reservation, its spot and the lot's tariff in one query
+    row = (
+        db.session.query(ReservedParking, ParkingLot.price, ParkingLot.daily_cap, ParkingLot.tariff_bands)
+        .join(ReservedParking.spot)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .options(db.contains_eager(ReservedParking.spot))
+        .filter(ReservedParking.id == reservation_id)
+        .first()
+    )
+    if row is None:
+        return jsonify({"message": "Reservation not found"}), 404
+    reservation, price, daily_cap, tariff_bands = row
 
     if reservation.user_id != user_id:
         return jsonify({"message": "You are not authorized to release this spot. User who booked the spot is: " + str(reservation.user_id) + " and you are: " + str(user_id)}), 403
-    
+
+    # Close the reservation with one conditional UPDATE: of concurrent releases only the first
+    # matches exit_time IS NULL, so the charge is computed and the email queued exactly once
     exit_time = datetime.now()
-    reservation.exit_time = exit_time
-    spot = ParkingSpot.query.get_or_404(reservation.spot_id)
-    lot = ParkingLot.query.get_or_404(spot.lot_id)
-    price_per_hour = lot.price * (exit_time - reservation.park_time).total_seconds() / 3600
-    total_cost = (exit_time - reservation.park_time).total_seconds() / 3600 * price_per_hour
-    reservation.total_cost = total_cost
-    spot.is_available = True
-    db.session.add(reservation)
-    db.session.add(spot)
+    closed = db.session.execute(
+        db.update(ReservedParking)
+        .where(ReservedParking.id == reservation.id, ReservedParking.exit_time == None)
+        .values(
+            exit_time=exit_time,
+            total_cost=reservation_cost(tariff(price, daily_cap, tariff_bands), reservation.park_time, exit_time)
+        )
+    )
+    if closed.rowcount != 1:
+        db.session.rollback()
+        return jsonify({"message": "Parking already released"}), 400
+
+    # The counter moves by the rows the conditional UPDATE changed, never by ORM history
+    spot = reservation.spot
+    freed = allocator.free_spot(spot.lot_id, spot.id)
+    outbox.enqueue(tasks.send_release_email, reservation.id)
+    body = {"message": "Parking released successfully"}
+    remember_response(body, 200)
     db.session.commit()
-    
-    reservation_id = reservation.id
-    tasks.send_release_email.delay(reservation_id)
+    invalidate("spots", "reservations", f"lot:{spot.lot_id}", f"user:{user_id}")
+    if freed:
+        live.publish_spot(spot.lot_id, spot.id, True)
+        allocator.release(spot.lot_id, spot.id)
+    outbox.dispatcher.wake()
 
-    return jsonify({"message": "Parking released successfully"}), 200
+    return jsonify(body), 200
 
-@cache.cached(timeout=60*60)
 @app.route("/user_search", methods=["GET"])
 @user_required
+@cached_response(timeout=60*60, namespaces=("lots", "user:{identity}"), per_user=True, query_string=True)
 def user_search():
-    query = request.args.get("query", "").lower()
-    lots = []
-    reservations = []
-
-    for lot in ParkingLot.query.all():
-        if (
-            query in lot.prime_location_name.lower()
-            or query in lot.address.lower()
-            or query in str(lot.pin_code)
-            or query in str(lot.price)
-        ):
-            lots.append({
-                "ID": lot.id,
-                "Location": lot.prime_location_name,
-                "Address": lot.address,
-                "Pin": lot.pin_code,
-                "Price": lot.price
-            })
-
-    for res in ReservedParking.query.filter_by(user_id=get_jwt_identity()).all():
-        if (
-            query in str(res.id)
-            or query in str(res.user_id)
-            or query in str(res.spot_id)
-            or (res.park_time and query in res.park_time.strftime("%Y-%m-%d %H:%M").lower())
-            or (res.exit_time and query in res.exit_time.strftime("%Y-%m-%d %H:%M").lower())
-            or (res.total_cost and query in str(res.total_cost))
-        ):
-            reservations.append({
-                "ID": res.id,
-                "User ID": res.user_id,
-                "Spot ID": res.spot_id,
-                "Park Time": res.park_time.strftime("%Y-%m-%d %H:%M"),
-                "Exit Time": res.exit_time.strftime("%Y-%m-%d %H:%M") if res.exit_time else "N/A",
-                "Total Cost": res.total_cost
-            })
+    query = request.args.get("query", "").strip().lower()
+    limit, offset = page_args(request.args)
+
+    lots = [{
+        "ID": lot.id,
+        "Location": lot.prime_location_name,
+        "Address": lot.address,
+        "Pin": lot.pin_code,
+        "Price": lot.price
+    } for lot in search_lots(query, limit, offset, match_price=True)]
+
+    reservations = [{
+        "ID": res.id,
+        "User ID": res.user_id,
+        "Spot ID": res.spot_id,
+        "Park Time": res.park_time.strftime("%Y-%m-%d %H:%M"),
+        "Exit Time": res.exit_time.strftime("%Y-%m-%d %H:%M") if res.exit_time else "N/A",
+        "Total Cost": res.total_cost
+    } for res in search_reservations(query, limit, offset, user_id=int(get_jwt_identity()), match_times=True)]
 
     return jsonify({
         "lots": lots,
-        "reservations": reservations
+        "reservations": reservations,
+        "limit": limit,
+        "offset": offset
     })
 
 def no_of_available_spots(lot_id):
-    return ParkingSpot.query.filter_by(lot_id=lot_id, is_available=True).count()
+    lot = ParkingLot.query.get(lot_id)
+    return lot.available_spots if lot else 0
 
-@cache.cached(timeout=60*60)
 @app.route("/get_user_reservations/<string:user_name>", methods=["GET"])
 @user_required
+@cached_response(timeout=60*60, namespaces=("locations", "lots", "spots", "user:{identity}"), per_user=True, query_string=True)
 def get_user_reservations(user_name):
-    user_id = User.query.filter_by(username=user_name).first().id
-    lots = ParkingLot.query.all()
-    spots = ParkingSpot.query.all()
-    locations = Location.query.all()
-    reservations = ReservedParking.query.filter_by(user_id=user_id).all()
+    # Served for the token's user; user_name only stays in the path for existing clients
+    user_id = int(get_jwt_identity())
+    lots, next_lots = id_page(ParkingLot, row_query(LOT_COLUMNS), request.args, "lots_")
+    spot_fields, next_spots = spot_listing(lots)
+    reservations, next_reservations = reservation_page(row_query(RESERVATION_COLUMNS).filter(ReservedParking.user_id == user_id), request.args, "reservations_")
     
     return jsonify({
-        "lots": [lot.to_dict() for lot in lots],
-        "spots": [spot.to_dict() for spot in spots],
-        "locations": [loc.to_dict() for loc in locations],
-        "reservations": [res.to_dict() for res in reservations]
+        "lots": rows_to_dicts(lots),
+        **spot_fields,
+        "locations": locations_with_lots(),
+        "reservations": rows_to_dicts(reservations),
+        "next_cursors": {"lots": next_lots, "spots": next_spots, "reservations": next_reservations}
         }), 200
 
 @app.route("/available_spots/<int:lot_id>", methods=["GET"])
 @user_required
 def available_spots(lot_id):
-    count = ParkingSpot.query.filter_by(lot_id=lot_id, is_available=True).count()
+    count = no_of_available_spots(lot_id)
     return jsonify({"available_spots": count}), 200
 
+@app.route("/available_spots", methods=["GET"])
+@jwt_required()
+@cached_response(timeout=60*60, namespaces=("lots", "spots"))
+def all_available_spots():
+    # One row per lot straight from the maintained counters, no scan over parking_spot
+    rows = db.session.query(ParkingLot.id, ParkingLot.available_spots).all()
+    return jsonify({"available_spots": {str(lot_id): count for lot_id, count in rows}}), 200
+
+@app.route("/lots/<int:lot_id>/occupancy", methods=["GET"])
+@jwt_required()
+def lot_occupancy(lot_id):
+    # Served from the occupancy samples (applications.occupancy), never from reservations
+    end = parse_datetime(request.args, "to") or datetime.now()
+    start = parse_datetime(request.args, "from") or end - OCCUPANCY_SPAN
+    if start >= end:
+        return jsonify({"message": "from must be before to"}), 400
+    try:
+        series = occupancy_series(lot_id, start, end, parse_int(request.args, "step"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if series is None:
+        return jsonify({"message": "Parking lot not found"}), 404
+    return jsonify(series), 200
+
+@app.route("/live/availability", methods=["GET"])
+@jwt_required()
+def live_availability():
+    """
+    Server-sent events with availability changes as they are committed. The stream opens with a
+    snapshot of the counters, then sends spot deltas and resync hints; ?lot_id= limits it to one lot.
+    """
+    lot_id = parse_int(request.args, "lot_id")
+    # Subscribe before taking the snapshot so no change can fall between the two
+    subscription = live.broker.subscribe()
+    try:
+        first = live.snapshot(lot_id)
+    except Exception:
+        subscription.close()
+        raise
+    # The snapshot is all the stream needs from the database; give the connection back to the pool
+    db.session.remove()
+    return Response(
+        live.event_stream(subscription, first, lot_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/user_summary", methods=["GET"])
 @user_required
 def user_summary():
     user_id = int(get_jwt_identity())
-    lots = ParkingLot.query.all()
-    spots = ParkingSpot.query.all()
-    reservations = ReservedParking.query.filter_by(user_id=user_id).all()
+    lots, next_lots = id_page(ParkingLot, row_query(LOT_COLUMNS), request.args, "lots_")
+    spot_fields, next_spots = spot_listing(lots)
+    reservations, next_reservations = reservation_page(row_query(RESERVATION_COLUMNS).filter(ReservedParking.user_id == user_id), request.args, "reservations_")
     return jsonify({
-        "lots": [lot.to_dict() for lot in lots],
-        "spots": [spot.to_dict() for spot in spots],
-        "reservations": [res.to_dict() for res in reservations]
+        "lots": rows_to_dicts(lots),
+        **spot_fields,
+        "reservations": rows_to_dicts(reservations),
+        "next_cursors": {"lots": next_lots, "spots": next_spots, "reservations": next_reservations}
         }), 200
 
-@cache.cached(timeout=60*60)
 @app.route("/get_usernames", methods=["GET"])
 @user_required
+@cached_response(timeout=60*60, namespaces=("users",))
 def get_usernames():
     users = User.query.filter_by(admin=False).all()
     return jsonify({"usernames": [user.username for user in users]}), 200
 
-@cache.cached(timeout=60*60)
 @app.route("/user_profile", methods=["GET"])
 @user_required
+@cached_response(timeout=60*60, namespaces=("user:{identity}",), per_user=True)
 def user_profile():
-    user = User.query.get(get_jwt_identity())
+    user = current_user()
+    if user is None:
+        return jsonify({"message": "User not found"}), 404
     #only return name, username, email
     return jsonify({
         "name": user.name,
@@ -570,19 +745,67 @@ def user_profile():
 @user_required
 def update_user_info():
     data = request.get_json()
-    user = User.query.get(get_jwt_identity())
-    user.name = data.get("name")
-    user.username = data.get("username")
-    user.email = data.get("email")
+    user_id = int(get_jwt_identity())
+    updated = User.query.filter_by(id=user_id).update({
+        "name": data.get("name"),
+        "username": data.get("username"),
+        "email": data.get("email"),
+    })
+    if not updated:
+        return jsonify({"message": "User not found"}), 404
     db.session.commit()
+    forget_user(user_id)
+    invalidate("users", f"user:{user_id}")
     return jsonify({"message": "User information updated successfully"}), 200
 
+##################################################################################
+#################################Data Export######################################
+##################################################################################
+
+@app.route("/export/reservations", methods=["GET"])
+@jwt_required()
+def export_reservations():
+    export_format = request.args.get("format", "csv").lower()
+    if export_format not in ("csv", "ndjson"):
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+
+    # Build (and validate) the query before streaming starts so bad filters still get a 400
+    statement = filter_reservations(reservation_export_query(), request.args)
+    if get_jwt()["admin"]:
+        user_id = parse_int(request.args, "user_id")
+        if user_id is not None:
+            statement = statement.where(ReservedParking.user_id == user_id)
+    else:
+        statement = statement.where(ReservedParking.user_id == int(get_jwt_identity()))
+
+    rows = iter_export_rows(statement)
+    if export_format == "csv":
+        return Response(
+            stream_with_context(stream_csv(rows)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=reservations.csv"}
+        )
+    return Response(stream_with_context(stream_ndjson(rows)), mimetype="application/x-ndjson")
+
 ##################################################################################
 ###############################Cache Management###################################
 ##################################################################################
 
+@app.route("/cache_stats", methods=["GET"])
+@admin_required
+def get_cache_stats():
+    # Counters of this worker process since it started
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return jsonify({
+        **cache_stats,
+        "hit_ratio": cache_stats["hits"] / lookups if lookups else None
+    }), 200
+
 @app.route("/clear_cache", methods=["POST"])
 @jwt_required()
 def clear_cache():
-    cache.clear()
+    try:
+        cache.clear()
+    except Exception:
+        return jsonify({"message": "Cache backend unavailable"}), 503
     return jsonify({"message": "Cache cleared successfully"}), 200
\ No newline at end of file
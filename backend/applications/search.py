@@ -0,0 +1,162 @@
+from applications.models import db, User, ParkingLot, ReservedParking
+from sqlalchemy.exc import OperationalError
+import re
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# External-content FTS5 tables over lot name/address and user name/username/email.
+# The triggers keep them in sync with every write, including bulk statements.
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS lot_fts USING fts5(
+        prime_location_name, address, content='parking_lot', content_rowid='id', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS lot_fts_ai AFTER INSERT ON parking_lot BEGIN
+        INSERT INTO lot_fts(rowid, prime_location_name, address)
+        VALUES (new.id, new.prime_location_name, new.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lot_fts_ad AFTER DELETE ON parking_lot BEGIN
+        INSERT INTO lot_fts(lot_fts, rowid, prime_location_name, address)
+        VALUES ('delete', old.id, old.prime_location_name, old.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lot_fts_au AFTER UPDATE OF prime_location_name, address ON parking_lot BEGIN
+        INSERT INTO lot_fts(lot_fts, rowid, prime_location_name, address)
+        VALUES ('delete', old.id, old.prime_location_name, old.address);
+        INSERT INTO lot_fts(rowid, prime_location_name, address)
+        VALUES (new.id, new.prime_location_name, new.address);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_fts USING fts5(
+        name, username, email, content='user', content_rowid='id', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS user_fts_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO user_fts(rowid, name, username, email)
+        VALUES (new.id, new.name, new.username, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_fts_ad AFTER DELETE ON "user" BEGIN
+        INSERT INTO user_fts(user_fts, rowid, name, username, email)
+        VALUES ('delete', old.id, old.name, old.username, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_fts_au AFTER UPDATE OF name, username, email ON "user" BEGIN
+        INSERT INTO user_fts(user_fts, rowid, name, username, email)
+        VALUES ('delete', old.id, old.name, old.username, old.email);
+        INSERT INTO user_fts(rowid, name, username, email)
+        VALUES (new.id, new.name, new.username, new.email);
+    END""",
+]
+
+fts_enabled = False
+
+def init_search_index():
+    """
+    Create the FTS5 tables and triggers if needed and fill any freshly created table.
+    Falls back to indexed LIKE prefix matching on non-SQLite databases or SQLite builds without FTS5.
+    """
+    global fts_enabled
+    if db.engine.dialect.name != 'sqlite':
+        fts_enabled = False
+        return
+    try:
+        with db.engine.begin() as conn:
+            existing = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE name IN ('lot_fts', 'user_fts')"
+            ).scalars().all()
+            for statement in FTS_DDL:
+                conn.exec_driver_sql(statement)
+            for table in ('lot_fts', 'user_fts'):
+                if table not in existing:
+                    conn.exec_driver_sql(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+        fts_enabled = True
+    except OperationalError:
+        fts_enabled = False
+
+def page_args(args):
+    """Read limit/offset from the query string, clamped to MAX_LIMIT."""
+    try:
+        limit = min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except (TypeError, ValueError):
+        limit = DEFAULT_LIMIT
+    try:
+        offset = max(int(args.get('offset', 0)), 0)
+    except (TypeError, ValueError):
+        offset = 0
+    return limit, offset
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def fts_match(query):
+    """Turn free text into an FTS5 query where every word is a prefix match."""
+    tokens = re.findall(r'\w+', query)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def prefix_match(column, query):
+    return column.ilike(escape_like(query) + '%', escape='\\')
+
+def text_condition(model, fts_table, columns, query):
+    if fts_enabled:
+        match = fts_match(query)
+        if match is None:
+            return None
+        return model.id.in_(
+            db.select(db.literal_column('rowid'))
+            .select_from(db.table(fts_table))
+            .where(db.literal_column(fts_table).op('MATCH')(match))
+        )
+    return db.or_(*(prefix_match(column, query) for column in columns))
+
+def search_users(query, limit, offset):
+    users = User.query.filter_by(admin=False)
+    if query and query != 'all':
+        condition = text_condition(User, 'user_fts', [User.name, User.username, User.email], query)
+        if condition is None:
+            return []
+        users = users.filter(condition)
+    return users.order_by(User.id).limit(limit).offset(offset).all()
+
+def search_lots(query, limit, offset, match_price=False):
+    lots = ParkingLot.query
+    if query and query != 'all':
+        conditions = [
+            # Range form of a prefix match so the pin_code index is usable
+            db.and_(ParkingLot.pin_code >= query, ParkingLot.pin_code < query + '\uffff')
+        ]
+        condition = text_condition(
+            ParkingLot, 'lot_fts', [ParkingLot.prime_location_name, ParkingLot.address], query
+        )
+        if condition is not None:
+            conditions.append(condition)
+        if match_price:
+            try:
+                conditions.append(ParkingLot.price == float(query))
+            except ValueError:
+                pass
+        lots = lots.filter(db.or_(*conditions))
+    return lots.order_by(ParkingLot.id).limit(limit).offset(offset).all()
+
+def search_reservations(query, limit, offset, user_id=None, match_times=False):
+    """
+    Numeric queries match reservation, user and spot ids exactly (all indexed).
+    With match_times, a query like "2025-06-01" also prefix-matches park/exit time.
+    """
+    reservations = ReservedParking.query
+    if user_id is not None:
+        reservations = reservations.filter(ReservedParking.user_id == user_id)
+    if query and query != 'all':
+        conditions = []
+        if query.isdigit():
+            number = int(query)
+            conditions += [
+                ReservedParking.id == number,
+                ReservedParking.user_id == number,
+                ReservedParking.spot_id == number,
+            ]
+        if match_times:
+            pattern = escape_like(query) + '%'
+            conditions += [
+                db.cast(ReservedParking.park_time, db.String).like(pattern, escape='\\'),
+                db.cast(ReservedParking.exit_time, db.String).like(pattern, escape='\\'),
+            ]
+        if not conditions:
+            return []
+        reservations = reservations.filter(db.or_(*conditions))
+    return reservations.order_by(ReservedParking.id).limit(limit).offset(offset).all()
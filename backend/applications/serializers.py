@@ -0,0 +1,60 @@
+from applications.models import db, Location, ParkingLot, ParkingSpot, ReservedParking, User
+
+# Column lists in the same key order as the models' to_dict(), selected as plain rows
+LOCATION_COLUMNS = (Location.id, Location.name, Location.city, Location.latitude, Location.longitude)
+LOT_COLUMNS = (
+    ParkingLot.id,
+    ParkingLot.prime_location_name,
+    ParkingLot.price,
+    ParkingLot.address,
+    ParkingLot.pin_code,
+    ParkingLot.number_of_spots,
+    ParkingLot.available_spots,
+    ParkingLot.location_id,
+    ParkingLot.daily_cap,
+    ParkingLot.tariff_bands,
+)
+SPOT_COLUMNS = (ParkingSpot.id, ParkingSpot.lot_id, ParkingSpot.is_available)
+RESERVATION_COLUMNS = (
+    ReservedParking.id,
+    ReservedParking.user_id,
+    ReservedParking.spot_id,
+    ReservedParking.park_time,
+    ReservedParking.exit_time,
+    ReservedParking.total_cost,
+)
+# Everything in User.to_dict(), never the password hash
+USER_COLUMNS = (User.id, User.name, User.username, User.email, User.admin, User.last_login)
+
+LOCATION_KEYS = tuple(column.key for column in LOCATION_COLUMNS)
+LOT_KEYS = tuple(column.key for column in LOT_COLUMNS)
+
+def row_query(columns):
+    """
+    Read-only listing query over `columns`. It returns Row tuples instead of ORM objects,
+    and still works with the filters and keyset paging written against the model.
+    """
+    return db.session.query(*columns)
+
+def rows_to_dicts(rows):
+    """Turn Row tuples into the same dicts the models' to_dict() would produce."""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+def locations_with_lots():
+    """
+    Same output as [loc.to_dict() for loc in Location.query.all()], built from two SELECTs
+    (locations, then all lots) however many locations there are.
+    """
+    lots_by_location = {}
+    for row in db.session.execute(db.select(*LOT_COLUMNS).order_by(ParkingLot.location_id, ParkingLot.id)):
+        lots_by_location.setdefault(row.location_id, []).append(dict(zip(LOT_KEYS, row)))
+
+    locations = []
+    for row in db.session.execute(db.select(*LOCATION_COLUMNS).order_by(Location.id)):
+        location = dict(zip(LOCATION_KEYS, row))
+        location["lots"] = lots_by_location.get(row.id, [])
+        locations.append(location)
+    return locations
@@ -0,0 +1,80 @@
+from applications.models import db, ParkingSpot
+from applications.cache_utils import cache, namespace_versions
+import base64
+import logging
+
+logger = logging.getLogger(__name__)
+
+SPOT_MAP_TIMEOUT = 60 * 60
+
+def _bitmap(length, offsets):
+    """Bit i (byte i // 8, least significant bit first) is set for every offset i."""
+    bits = bytearray((length + 7) // 8)
+    for i in offsets:
+        bits[i >> 3] |= 1 << (i & 7)
+    return base64.b64encode(bytes(bits)).decode()
+
+def build_spot_map(lot_id, spots):
+    """
+    Compact form of a lot's spots, given its (id, is_available) rows in id order.
+    Spots cover the id range base_id .. base_id + length - 1; `available` marks the free ones.
+    `present` is only sent when the range has gaps (ids that are not spots of this lot).
+    """
+    if not spots:
+        return {"lot_id": lot_id, "base_id": None, "length": 0, "available_spots": 0,
+                "available": "", "present": None}
+    base_id = spots[0][0]
+    length = spots[-1][0] - base_id + 1
+    free = [spot_id - base_id for spot_id, is_available in spots if is_available]
+    return {
+        "lot_id": lot_id,
+        "base_id": base_id,
+        "length": length,
+        "available_spots": len(free),
+        "available": _bitmap(length, free),
+        "present": None if len(spots) == length else _bitmap(length, (spot_id - base_id for spot_id, _ in spots)),
+    }
+
+def _cache_key(lot_id, spotmaps_version, lot_version):
+    return f"spotmap:{lot_id}|spotmaps@{spotmaps_version}|lot:{lot_id}@{lot_version}"
+
+def spot_maps(lot_ids):
+    """
+    Spot maps for `lot_ids`, served from the cache per lot.
+    A lot's entry is dropped by invalidate("lot:<id>") when one of its spots is reserved, released
+    or resized, and all entries by invalidate("spotmaps"). Misses are rebuilt with one query.
+    """
+    if not lot_ids:
+        return []
+    versions = namespace_versions(["spotmaps"] + [f"lot:{lot_id}" for lot_id in lot_ids])
+    keys = None
+    maps = dict.fromkeys(lot_ids)
+    if versions is not None:
+        keys = [_cache_key(lot_id, versions[0], version) for lot_id, version in zip(lot_ids, versions[1:])]
+        try:
+            maps = dict(zip(lot_ids, cache.get_many(*keys)))
+        except Exception:
+            logger.exception("Cache backend unavailable, building spot maps uncached")
+            keys = None
+
+    missing = [lot_id for lot_id, spot_map in maps.items() if spot_map is None]
+    if missing:
+        spots = {lot_id: [] for lot_id in missing}
+        rows = db.session.execute(
+            db.select(ParkingSpot.lot_id, ParkingSpot.id, ParkingSpot.is_available)
+            .where(ParkingSpot.lot_id.in_(missing))
+            .order_by(ParkingSpot.lot_id, ParkingSpot.id)
+        )
+        for lot_id, spot_id, is_available in rows:
+            spots[lot_id].append((spot_id, is_available))
+        built = {lot_id: build_spot_map(lot_id, spots[lot_id]) for lot_id in missing}
+        if keys is not None:
+            try:
+                cache.set_many(
+                    {key: built[lot_id] for lot_id, key in zip(lot_ids, keys) if lot_id in built},
+                    timeout=SPOT_MAP_TIMEOUT
+                )
+            except Exception:
+                logger.exception("Cache backend unavailable, spot maps not stored")
+        maps.update(built)
+    return [maps[lot_id] for lot_id in lot_ids]
@@ -0,0 +1,81 @@
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from applications.models import db, User
+from applications.cache_utils import namespace_versions
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+USER_CONTEXT_TTL = 5 * 60
+USER_CONTEXT_MAX_ENTRIES = 10_000
+
+UserContext = namedtuple("UserContext", ["id", "name", "username", "email", "admin"])
+
+class UserContextCache:
+    """
+    Process-level LRU of UserContext by user id, with a TTL.
+    Every entry remembers the version of the user's "user:<id>" cache namespace it was loaded under,
+    so invalidate("user:<id>") in any worker makes the other workers reload it too.
+    """
+
+    def __init__(self, ttl=USER_CONTEXT_TTL, max_entries=USER_CONTEXT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, entry_version, context = entry
+            if expires_at < time.monotonic() or entry_version != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return context
+
+    def put(self, user_id, version, context):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, version, context)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+user_contexts = UserContextCache()
+
+def current_user():
+    """
+    The UserContext of the JWT identity, or None if the user no longer exists.
+    Looked up once per request (g), and from the process cache across requests.
+    """
+    if "user_context" in g:
+        return g.user_context
+
+    user_id = int(get_jwt_identity())
+    versions = namespace_versions([f"user:{user_id}"])
+    # Without the namespace version (cache backend down) the process cache cannot be validated
+    version = versions[0] if versions is not None else None
+    context = user_contexts.get(user_id, version) if version is not None else None
+    if context is None:
+        row = (
+            db.session.query(User.id, User.name, User.username, User.email, User.admin)
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is not None:
+            context = UserContext(*row)
+            if version is not None:
+                user_contexts.put(user_id, version, context)
+    g.user_context = context
+    return context
+
+def forget_user(user_id):
+    """Drop a user's cached context after it changed; call together with invalidate("user:<id>")."""
+    user_contexts.forget(user_id)
+    g.pop("user_context", None)
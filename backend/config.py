@@ -6,15 +6,58 @@ load_dotenv()
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# PRAGMAs applied to every new SQLite connection, selected with STORAGE_PROFILE.
+# "wal" lets readers run alongside the single writer and avoids an fsync per commit;
+# "safe" is the old behaviour (rollback journal, full sync).
+SQLITE_PROFILES = {
+    "safe": {
+        "foreign_keys": "ON",
+    },
+    "wal": {
+        "foreign_keys": "ON",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64000)),  # negative = KiB, i.e. 64 MB
+        "temp_store": "MEMORY",
+    },
+}
+
+def engine_options(uri):
+    """Connection pool settings for the configured database URI."""
+    pool = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+    }
+    if uri.startswith("sqlite"):
+        if uri in ("sqlite://", "sqlite:///:memory:"):
+            # In-memory databases live in a single connection; keep SQLAlchemy's default pool
+            return {}
+        # WAL gives every pooled connection its own read snapshot; the driver-level timeout
+        # mirrors busy_timeout for the connect step
+        return {**pool, "connect_args": {"timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)) / 1000}}
+    # Client/server databases (e.g. postgresql+psycopg2://..., driver installed separately)
+    return {**pool, "pool_pre_ping": True, "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800))}
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(basedir, 'instance', 'parking_db.db')}"
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(basedir, 'instance', 'parking_db.db')}")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STORAGE_PROFILE = os.getenv("STORAGE_PROFILE", "wal")
+    SQLITE_PRAGMAS = SQLITE_PROFILES[STORAGE_PROFILE]
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=4)
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))  # existing hashes are upgraded on the next login
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
     ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
     MAIL_SERVER = os.getenv("MAIL_SERVER")
     MAIL_PORT = os.getenv("MAIL_PORT")
-    CACHE_TYPE = 'redis'
-    CACHE_REDIS_URL = "redis://localhost:6379/0"
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")  # "default" for Flask's stdlib encoder
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "RedisCache")  # SimpleCache for tests / local runs
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    LIVE_BROKER = os.getenv("LIVE_BROKER", "redis")  # "local" for a single process / tests
+    LIVE_REDIS_URL = os.getenv("LIVE_REDIS_URL", "redis://localhost:6379/3")
+    OUTBOX_DISPATCHER = os.getenv("OUTBOX_DISPATCHER", "thread")  # "off": only the periodic Celery sweep
     CELERY_BROKER_URL = 'redis://localhost:6379/1'
-    CELERY_RESULT_BACKEND = 'redis://localhost:6379/2'
\ No newline at end of file
+    CELERY_RESULT_BACKEND = 'redis://localhost:6379/2'
@@ -0,0 +1,39 @@
+"""add parking_lot.available_spots counter
+
+Revision ID: 3f1a9c2d7b10
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() after this change already have the column
+    columns = [col['name'] for col in sa.inspect(op.get_bind()).get_columns('parking_lot')]
+    if 'available_spots' not in columns:
+        with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('available_spots', sa.Integer(), nullable=False, server_default='0'))
+
+    parking_lot = sa.table('parking_lot', sa.column('id', sa.Integer), sa.column('available_spots', sa.Integer))
+    parking_spot = sa.table('parking_spot', sa.column('id', sa.Integer), sa.column('lot_id', sa.Integer),
+                            sa.column('is_available', sa.Boolean))
+    free_count = (
+        sa.select(sa.func.count(parking_spot.c.id))
+        .where(parking_spot.c.lot_id == parking_lot.c.id, parking_spot.c.is_available == sa.true())
+        .scalar_subquery()
+    )
+    op.execute(parking_lot.update().values(available_spots=free_count))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('available_spots')
@@ -0,0 +1,29 @@
+"""add indexes used by admin/user search
+
+Revision ID: 8b4e2d61c0a5
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e2d61c0a5'
+down_revision = '3f1a9c2d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # username/email are already covered by their unique constraints.
+    # The FTS5 tables are created at startup by applications.search.init_search_index().
+    op.create_index('ix_parking_lot_pin_code', 'parking_lot', ['pin_code'], unique=False, if_not_exists=True)
+    op.create_index('ix_reserved_parking_user_id', 'reserved_parking', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_reserved_parking_spot_id', 'reserved_parking', ['spot_id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_reserved_parking_spot_id', table_name='reserved_parking')
+    op.drop_index('ix_reserved_parking_user_id', table_name='reserved_parking')
+    op.drop_index('ix_parking_lot_pin_code', table_name='parking_lot')
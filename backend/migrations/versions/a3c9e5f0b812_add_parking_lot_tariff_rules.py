@@ -0,0 +1,32 @@
+"""add parking_lot.daily_cap and parking_lot.tariff_bands
+
+Revision ID: a3c9e5f0b812
+Revises: f2a8c4d1b937
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e5f0b812'
+down_revision = 'f2a8c4d1b937'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = [col['name'] for col in inspector.get_columns('parking_lot')]
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        if 'daily_cap' not in columns:
+            batch_op.add_column(sa.Column('daily_cap', sa.Float(), nullable=True))
+        if 'tariff_bands' not in columns:
+            batch_op.add_column(sa.Column('tariff_bands', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('tariff_bands')
+        batch_op.drop_column('daily_cap')
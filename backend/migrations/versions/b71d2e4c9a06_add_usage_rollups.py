@@ -0,0 +1,51 @@
+"""add lot_usage_rollup, daily_activity and reserved_parking exit_time index
+
+Revision ID: b71d2e4c9a06
+Revises: a3c9e5f0b812
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d2e4c9a06'
+down_revision = 'a3c9e5f0b812'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('lot_usage_rollup'):
+        op.create_table(
+            'lot_usage_rollup',
+            sa.Column('lot_id', sa.Integer(), nullable=False),
+            sa.Column('grain', sa.String(length=4), nullable=False),
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.Column('releases', sa.Integer(), nullable=False),
+            sa.Column('occupied_seconds', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('lot_id', 'grain', 'bucket')
+        )
+    op.create_index('ix_lot_usage_rollup_grain_bucket', 'lot_usage_rollup', ['grain', 'bucket'], unique=False, if_not_exists=True)
+
+    if not inspector.has_table('daily_activity'):
+        op.create_table(
+            'daily_activity',
+            sa.Column('day', sa.DateTime(), nullable=False),
+            sa.Column('active_users', sa.Integer(), nullable=False),
+            sa.Column('reservations', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('day')
+        )
+
+    op.create_index('ix_reserved_parking_exit_time', 'reserved_parking', ['exit_time'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_reserved_parking_exit_time', table_name='reserved_parking')
+    op.drop_table('daily_activity')
+    op.drop_index('ix_lot_usage_rollup_grain_bucket', table_name='lot_usage_rollup')
+    op.drop_table('lot_usage_rollup')
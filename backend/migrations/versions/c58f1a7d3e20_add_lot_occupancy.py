@@ -0,0 +1,38 @@
+"""add lot_occupancy
+
+Revision ID: c58f1a7d3e20
+Revises: b71d2e4c9a06
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58f1a7d3e20'
+down_revision = 'b71d2e4c9a06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('lot_occupancy'):
+        op.create_table(
+            'lot_occupancy',
+            sa.Column('lot_id', sa.Integer(), nullable=False),
+            sa.Column('resolution', sa.Integer(), nullable=False),
+            sa.Column('bucket', sa.Integer(), nullable=False),
+            sa.Column('occupied', sa.Integer(), nullable=False),
+            sa.Column('low', sa.Integer(), nullable=False),
+            sa.Column('peak', sa.Integer(), nullable=False),
+            sa.Column('occupied_seconds', sa.Integer(), nullable=False),
+            sa.Column('last_change', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('lot_id', 'resolution', 'bucket'),
+            sqlite_with_rowid=False
+        )
+
+
+def downgrade():
+    op.drop_table('lot_occupancy')
@@ -0,0 +1,40 @@
+"""add user.last_reminded_at, reminder index and task_watermark
+
+Revision ID: c7d35e9a4f21
+Revises: 8b4e2d61c0a5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d35e9a4f21'
+down_revision = '8b4e2d61c0a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = [col['name'] for col in inspector.get_columns('user')]
+    if 'last_reminded_at' not in columns:
+        with op.batch_alter_table('user', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('last_reminded_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_user_admin_last_login', 'user', ['admin', 'last_login'], unique=False, if_not_exists=True)
+
+    if not inspector.has_table('task_watermark'):
+        op.create_table(
+            'task_watermark',
+            sa.Column('name', sa.String(length=80), nullable=False),
+            sa.Column('value', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('task_watermark')
+    op.drop_index('ix_user_admin_last_login', table_name='user')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('last_reminded_at')
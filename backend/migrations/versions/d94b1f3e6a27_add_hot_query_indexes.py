@@ -0,0 +1,39 @@
+"""composite and partial indexes for spot availability and reservation history
+
+Revision ID: d94b1f3e6a27
+Revises: c7d35e9a4f21
+Create Date: 2026-10-18 15:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd94b1f3e6a27'
+down_revision = 'c7d35e9a4f21'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text('exit_time IS NULL')
+
+
+def upgrade():
+    op.create_index('ix_parking_spot_lot_available', 'parking_spot', ['lot_id', 'is_available'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_reserved_parking_user_park_time', 'reserved_parking', ['user_id', 'park_time'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_reserved_parking_park_time', 'reserved_parking', ['park_time'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_reserved_parking_active', 'reserved_parking', ['park_time'], unique=False,
+                    sqlite_where=ACTIVE, postgresql_where=ACTIVE, if_not_exists=True)
+    # Covered by the (user_id, park_time) prefix
+    op.drop_index('ix_reserved_parking_user_id', table_name='reserved_parking', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_reserved_parking_user_id', 'reserved_parking', ['user_id'], unique=False)
+    op.drop_index('ix_reserved_parking_active', table_name='reserved_parking')
+    op.drop_index('ix_reserved_parking_park_time', table_name='reserved_parking')
+    op.drop_index('ix_reserved_parking_user_park_time', table_name='reserved_parking')
+    op.drop_index('ix_parking_spot_lot_available', table_name='parking_spot')
@@ -0,0 +1,58 @@
+"""add outbox_message and idempotency_key
+
+Revision ID: f2a8c4d1b937
+Revises: d94b1f3e6a27
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c4d1b937'
+down_revision = 'd94b1f3e6a27'
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text('dispatched_at IS NULL')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('outbox_message'):
+        op.create_table(
+            'outbox_message',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('task', sa.String(length=120), nullable=False),
+            sa.Column('args', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('available_at', sa.DateTime(), nullable=False),
+            sa.Column('dispatched_at', sa.DateTime(), nullable=True),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_outbox_message_pending', 'outbox_message', ['available_at'], unique=False,
+                    sqlite_where=PENDING, postgresql_where=PENDING, if_not_exists=True)
+
+    if not inspector.has_table('idempotency_key'):
+        op.create_table(
+            'idempotency_key',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('endpoint', sa.String(length=255), nullable=False),
+            sa.Column('status_code', sa.Integer(), nullable=False),
+            sa.Column('response_body', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('user_id', 'key')
+        )
+    op.create_index('ix_idempotency_key_created_at', 'idempotency_key', ['created_at'], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_key_created_at', table_name='idempotency_key')
+    op.drop_table('idempotency_key')
+    op.drop_index('ix_outbox_message_pending', table_name='outbox_message')
+    op.drop_table('outbox_message')
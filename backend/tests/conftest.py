@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+# Config is read when `applications` is imported: use an in-memory database and in-process backends
+os.environ.update({
+    "DATABASE_URL": "sqlite://",
+    "CACHE_TYPE": "SimpleCache",
+    "LIVE_BROKER": "local",
+    "OUTBOX_DISPATCHER": "off",
+    "JWT_SECRET_KEY": "test-secret-key-at-least-32-bytes-long",
+    "BCRYPT_LOG_ROUNDS": "4",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+from applications import db  # noqa: E402
+from applications.cache_utils import cache  # noqa: E402
+from applications.models import User  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+def reset_database():
+    """Recreate the in-memory schema with just the admin account and an empty cache."""
+    db.session.remove()
+    db.drop_all()
+    cache.clear()
+    app_module.create_admin()
+
+@pytest.fixture
+def app():
+    """The application on a freshly created in-memory schema with just the admin account."""
+    reset_database()
+    yield app_module.app
+    db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def auth_headers(user):
+    token = create_access_token(
+        identity=str(user.id),
+        additional_claims={"username": user.username, "email": user.email, "admin": user.admin}
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def admin_headers(app):
+    return auth_headers(User.query.filter_by(admin=True).one())
+
+@pytest.fixture
+def user(app):
+    user = User(name="Test User", username="tester", email="tester@example.com", password="secret")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def user_headers(user):
+    return auth_headers(user)
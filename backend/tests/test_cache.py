@@ -0,0 +1,58 @@
+from applications import db
+from applications.cache_utils import cache
+from applications.models import Location, ParkingLot, ParkingSpot, ReservedParking
+import pytest
+
+@pytest.fixture
+def lot(app):
+    location = Location("Centre", "City", 12.9, 77.6)
+    db.session.add(location)
+    db.session.flush()
+    lot = ParkingLot("Lot A", 20.0, "Some street", "560001", 2)
+    lot.location_id = location.id
+    db.session.add(lot)
+    db.session.flush()
+    db.session.add_all([ParkingSpot(lot.id), ParkingSpot(lot.id)])
+    db.session.commit()
+    return lot
+
+@pytest.fixture
+def cache_down(app, monkeypatch):
+    """Every call into the cache backend fails, as with CACHE_TYPE=RedisCache and Redis stopped."""
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("Error 111 connecting to localhost:6379. Connection refused.")
+    for method in ("get", "get_many", "set", "set_many", "add", "delete", "clear"):
+        monkeypatch.setattr(cache.cache, method, unavailable)
+
+def test_writes_and_reads_succeed_without_cache_backend(client, lot, user_headers, cache_down):
+    reserved = client.post(f"/reserve_in_lot/{lot.id}", headers=user_headers)
+    assert reserved.status_code == 200, reserved.get_json()
+    reservation_id = reserved.get_json()["reservation"]["id"]
+
+    released = client.post(f"/release_parking/{reservation_id}", headers=user_headers)
+    assert released.status_code == 200, released.get_json()
+    assert db.session.get(ReservedParking, reservation_id).exit_time is not None
+
+    for path in ("/get_locations", "/get_lots", "/get_lots?format=columnar", "/available_spots", "/user_profile"):
+        assert client.get(path, headers=user_headers).status_code == 200, path
+
+def test_cached_endpoint_hits_until_a_write_invalidates(client, lot, user_headers, admin_headers):
+    def stats():
+        response = client.get("/cache_stats", headers=admin_headers)
+        assert response.status_code == 200
+        return response.get_json()
+
+    def lookups_after(path):
+        before = stats()
+        assert client.get(path, headers=user_headers).status_code == 200
+        after = stats()
+        return after["hits"] - before["hits"], after["misses"] - before["misses"]
+
+    assert lookups_after("/get_locations") == (0, 1)
+    assert lookups_after("/get_locations") == (1, 0)
+    assert stats()["hit_ratio"] > 0
+
+    # Booking a spot changes the lot's available_spots, which /get_locations embeds
+    assert client.post(f"/reserve_in_lot/{lot.id}", headers=user_headers).status_code == 200
+    assert lookups_after("/get_locations") == (0, 1)
+    assert lookups_after("/get_locations") == (1, 0)
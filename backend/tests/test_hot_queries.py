@@ -0,0 +1,212 @@
+from applications import db
+from applications.allocator import allocator
+from applications.cache_utils import cache
+from applications.instrumentation import count_queries
+from applications.models import Location, ParkingLot, ParkingSpot, ReservedParking, User
+from applications.pagination import filter_reservations, filter_spots
+from applications.serializers import RESERVATION_COLUMNS, row_query
+from datetime import datetime
+from sqlalchemy import event
+from conftest import app_module, auth_headers, reset_database
+from tools.seed import seed_database
+from tools.tasks import iter_monthly_report_rows
+import pytest
+import re
+import time
+
+NEWEST_FIRST = (ReservedParking.park_time.desc(), ReservedParking.id.desc())
+MONTH = (datetime(2026, 1, 1), datetime(2026, 2, 1))
+
+def query_plans(run):
+    """EXPLAIN QUERY PLAN details of every SELECT `run()` sends, with the exact SQL and parameters."""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    connection = db.session.connection()
+    return [
+        [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        for statement, parameters in statements
+    ]
+
+# (hot query, code that runs it, index it must use or None for "any index")
+HOT_QUERIES = [
+    ("allocator rebuild", lambda: allocator.rebuild(1), "ix_parking_spot_lot_available"),
+    ("free spots in a lot",
+     lambda: filter_spots(db.session.query(ParkingSpot.id), {"lot_id": "1", "available": "true"}).all(),
+     "ix_parking_spot_lot_available"),
+    ("user history",
+     lambda: row_query(RESERVATION_COLUMNS).filter(ReservedParking.user_id == 1).order_by(*NEWEST_FIRST).limit(10).all(),
+     "ix_reserved_parking_user_park_time"),
+    ("admin history",
+     lambda: row_query(RESERVATION_COLUMNS).order_by(*NEWEST_FIRST).limit(10).all(),
+     "ix_reserved_parking_park_time"),
+    ("active reservations",
+     lambda: filter_reservations(row_query(RESERVATION_COLUMNS), {"active": "1"}).order_by(*NEWEST_FIRST).limit(10).all(),
+     None),
+    ("reservations in a lot",
+     lambda: filter_reservations(row_query(RESERVATION_COLUMNS), {"lot_id": "1"}).order_by(*NEWEST_FIRST).limit(10).all(),
+     "ix_reserved_parking_spot_id"),
+    ("reservations of a spot",
+     lambda: row_query(RESERVATION_COLUMNS).filter(ReservedParking.spot_id == 1).all(),
+     "ix_reserved_parking_spot_id"),
+    ("monthly report range", lambda: list(iter_monthly_report_rows(*MONTH)), "ix_reserved_parking_park_time"),
+    ("reminder sweep",
+     lambda: db.session.query(User.id).filter(User.admin == False, User.last_login < MONTH[1]).order_by(User.last_login).limit(10).all(),
+     "ix_user_admin_last_login"),
+]
+
+@pytest.mark.parametrize("name, run, index", HOT_QUERIES, ids=[case[0] for case in HOT_QUERIES])
+def test_hot_query_uses_index(app, name, run, index):
+    plans = query_plans(run)
+    assert plans, f"{name} ran no SELECT"
+    for plan in plans:
+        # A bare "SCAN <table>" reads the whole table; SEARCH and SCAN ... USING INDEX do not
+        full_scans = [detail for detail in plan if re.fullmatch(r"SCAN \w+", detail)]
+        assert not full_scans, f"{name}: {plan}"
+        if index is not None:
+            assert any(re.search(rf"\bINDEX {index}\b", detail) for detail in plan), f"{name}: {plan}"
+
+def add_locations(count, user):
+    """`count` locations with two lots of two spots each, and one reservation by `user` per lot."""
+    for i in range(count):
+        location = Location(f"Location {i}", "City", 12.9, 77.6)
+        db.session.add(location)
+        db.session.flush()
+        for j in range(2):
+            lot = ParkingLot(f"Lot {i}-{j}", 20.0, "Some street", "560001", 2)
+            lot.location_id = location.id
+            db.session.add(lot)
+            db.session.flush()
+            spots = [ParkingSpot(lot.id) for _ in range(2)]
+            db.session.add_all(spots)
+            db.session.flush()
+            db.session.add(ReservedParking(user.id, spots[0].id, datetime(2026, 1, 1, 9), None, None))
+    db.session.commit()
+
+def listing_query_count(client, path, headers):
+    cache.clear()
+    with count_queries() as counter:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return counter.count
+
+@pytest.mark.parametrize("path, role", [
+    ("/get_locations", "user"),
+    ("/get_user_reservations/tester", "user"),
+    ("/get_lots", "user"),
+    ("/parking_lots", "admin"),
+])
+def test_listing_query_count_is_constant(client, user, user_headers, admin_headers, path, role):
+    headers = user_headers if role == "user" else admin_headers
+    add_locations(2, user)
+    # First request pays the per-process setup (init_worker), not part of the listing
+    client.get(path, headers=headers)
+    few = listing_query_count(client, path, headers)
+    add_locations(30, user)
+    many = listing_query_count(client, path, headers)
+    assert many == few, f"{path}: {few} queries for 2 locations, {many} for 32"
+
+def statements_of(run):
+    """The SQL statements `run()` sends, first word and table only (e.g. "UPDATE parking_spot")."""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        words = statement.replace('"', "").split()
+        table = words[words.index("INTO") + 1] if words[0] == "INSERT" else words[1]
+        statements.append(f"{words[0]} {table}")
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return statements
+
+def add_lot(spots):
+    location = Location("Centre", "City", 12.9, 77.6)
+    db.session.add(location)
+    db.session.flush()
+    lot = ParkingLot("Lot A", 20.0, "Some street", "560001", spots)
+    lot.location_id = location.id
+    db.session.add(lot)
+    db.session.flush()
+    db.session.add_all([ParkingSpot(lot.id) for _ in range(spots)])
+    db.session.commit()
+    return lot.id
+
+# Measured after the in-transaction rewrite: lot lookup, spot claim, lot counter, occupancy sample,
+# reservation + outbox + occupancy inserts and the live event's counter read
+RESERVE_STATEMENTS = 8
+
+def test_reserve_claims_spot_once_in_bounded_statements(client, user_headers):
+    lot_id = add_lot(3)
+    # Warm the allocator heap and per-process setup
+    client.post(f"/reserve_in_lot/{lot_id}", headers=user_headers)
+    statements = statements_of(lambda: client.post(f"/reserve_in_lot/{lot_id}", headers=user_headers))
+    # The reservation insert must not touch the already claimed spot again (no side session)
+    assert statements.count("UPDATE parking_spot") == 1, statements
+    assert len(statements) <= RESERVE_STATEMENTS, statements
+
+@pytest.mark.parametrize("open_reservations", [2, 40])
+def test_user_delete_frees_spots_in_constant_statements(client, user, user_headers, admin_headers, open_reservations):
+    lot_id = add_lot(40)
+    for _ in range(open_reservations):
+        assert client.post(f"/reserve_in_lot/{lot_id}", headers=user_headers).status_code == 200
+    user_id = user.id
+    db.session.remove()
+    with count_queries() as counter:
+        assert client.delete(f"/delete_user/{user_id}", headers=admin_headers).status_code == 200
+    # Set-based UPDATEs: the same statements for 2 or 40 open reservations
+    assert counter.count == 7
+    assert db.session.get(ParkingLot, lot_id).available_spots == 40
+    assert db.session.query(ParkingSpot).filter(ParkingSpot.is_available == False).count() == 0
+
+# Matches the capacity-test size the search rewrite was measured at
+SEARCH_DATASET = dict(users=1_000, locations=20, lots_per_location=5, spots_per_lot=50, reservations=100_000)
+SEARCH_BUDGET_SECONDS = 0.25
+
+@pytest.fixture(scope="module")
+def app_client():
+    return app_module.app.test_client()
+
+@pytest.fixture(scope="module")
+def search_dataset():
+    reset_database()
+    seed_database(**SEARCH_DATASET, echo=lambda message: None)
+    admin = User.query.filter_by(admin=True).one()
+    user = User.query.filter_by(admin=False).order_by(User.id).first()
+    yield auth_headers(admin), auth_headers(user), user
+    reset_database()
+
+def search_terms(user):
+    # A name prefix, a pin/number prefix, an id and a date prefix (reservation times)
+    return [user.username[:4], "560", str(user.id), datetime.now().strftime("%Y-%m")]
+
+def test_search_at_100k_reservations_uses_indexes(app_client, search_dataset):
+    admin_headers, user_headers, user = search_dataset
+    for term in search_terms(user):
+        paths = [(f"/search?q={term}", admin_headers), (f"/user_search?query={term}", user_headers)]
+        for path, headers in paths:
+            cache.clear()
+            plans = query_plans(lambda: app_client.get(path, headers=headers))
+            for plan in plans:
+                # Lots are few and user_search also matches them by price; users and reservations never scan
+                full_scans = [detail for detail in plan if re.fullmatch(r"SCAN (user|reserved_parking)", detail)]
+                assert not full_scans, f"{path}: {plan}"
+
+def test_search_at_100k_reservations_is_paged_and_fast(app_client, search_dataset):
+    admin_headers, user_headers, user = search_dataset
+    for term in ["all"] + search_terms(user):
+        cache.clear()
+        started = time.perf_counter()
+        response = app_client.get(f"/search?q={term}", headers=admin_headers)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200
+        body = response.get_json()
+        assert all(len(body[key]) <= body["limit"] for key in ("users", "lots", "reservations"))
+        # The old implementation loaded all 100k reservations into Python on every request (seconds)
+        assert elapsed < SEARCH_BUDGET_SECONDS, f"{term}: {elapsed:.3f}s"
@@ -0,0 +1,54 @@
+from applications.json_provider import OrjsonProvider
+from datetime import datetime, timedelta
+from flask.json.provider import DefaultJSONProvider
+import json
+import numpy
+import pytest
+import time
+
+@pytest.fixture
+def providers(app):
+    return OrjsonProvider(app), DefaultJSONProvider(app)
+
+def listing(rows):
+    start = datetime(2026, 10, 18, 8, 30)
+    return {"reservations": [{
+        "ID": i, "Spot ID": i % 97, "Parking Time": start + timedelta(minutes=i),
+        "Leaving Time": None, "Total Cost": i * 1.5, "Location": f"Lot {i % 13}",
+    } for i in range(rows)]}
+
+@pytest.mark.parametrize("obj", [
+    {1: "a", 2: "b"},
+    {"price": numpy.float64(12.5)},
+    {"big": 2 ** 70, "small": -(2 ** 65)},
+    {"nested": [{3: numpy.float64(0.25)}, {"huge": 10 ** 30}]},
+    listing(3),
+])
+def test_orjson_matches_default_provider(providers, obj):
+    fast, default = providers
+    assert json.loads(fast.dumps(obj)) == json.loads(default.dumps(obj))
+
+def test_orjson_serializes_numpy_scalars(providers):
+    fast, _ = providers
+    obj = {"price": numpy.float64(12.5), "spots": numpy.int64(3), "counts": numpy.array([1, 2])}
+    assert json.loads(fast.dumps(obj)) == {"price": 12.5, "spots": 3, "counts": [1, 2]}
+
+def test_orjson_response_falls_back_for_big_integers(app, providers):
+    fast, _ = providers
+    with app.test_request_context():
+        response = fast.response({"big": 2 ** 70})
+    assert response.get_json() == {"big": 2 ** 70}
+
+def test_orjson_serializes_listings_faster_than_default(providers):
+    fast, default = providers
+    obj = listing(5000)
+
+    def best_of(provider):
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            provider.dumps(obj)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    assert best_of(fast) < best_of(default)
@@ -0,0 +1,52 @@
+from tools import mail_bot
+import pytest
+import smtplib
+
+EMAILS = [{"to": f"user{i}@example.com", "subject": "Hello", "body": "Hi"} for i in range(20)]
+
+class FakeConnection:
+    """Stands in for flask_mail's Connection; `server` decides what connecting and sending do."""
+
+    def __init__(self, server):
+        self.server = server
+
+    def __enter__(self):
+        self.server.connects += 1
+        if self.server.down:
+            raise ConnectionRefusedError("Connection refused")
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, message):
+        if message.recipients[0] in self.server.rejects:
+            self.server.rejects.discard(message.recipients[0])
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.server.delivered.append(message.recipients[0])
+
+class FakeServer:
+    def __init__(self, down=False, rejects=()):
+        self.down = down
+        self.rejects = set(rejects)
+        self.connects = 0
+        self.delivered = []
+
+@pytest.fixture
+def server(app, monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(mail_bot.mail, "connect", lambda: FakeConnection(server))
+    return server
+
+def test_send_bulk_fails_whole_batch_fast_when_server_is_down(server):
+    server.down = True
+    sent, failed = mail_bot.send_bulk(EMAILS)
+    assert (sent, failed) == (0, EMAILS)
+    assert server.connects == mail_bot.MAX_CONNECT_RETRIES + 1
+
+def test_send_bulk_reconnects_after_a_failed_send(server):
+    server.rejects = {"user3@example.com"}
+    sent, failed = mail_bot.send_bulk(EMAILS)
+    assert (sent, failed) == (len(EMAILS), [])
+    assert server.connects == 2
+    assert sorted(server.delivered) == sorted(email["to"] for email in EMAILS)
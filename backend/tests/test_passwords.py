@@ -0,0 +1,60 @@
+from applications import db, passwords
+from applications.models import User
+from applications.passwords import PasswordHasher, PasswordHasherBusy
+import bcrypt as pybcrypt
+import pytest
+import threading
+import time
+
+def login(client, password):
+    return client.post("/login", json={"username": "tester", "password": password})
+
+def test_login_upgrades_hash_made_with_another_cost(client, user):
+    stale = pybcrypt.hashpw(b"secret", pybcrypt.gensalt(rounds=5)).decode()
+    user.password = stale
+    db.session.commit()
+
+    assert login(client, "wrong").status_code == 401
+    assert db.session.get(User, user.id).password == stale
+
+    assert login(client, "secret").status_code == 200
+    upgraded = db.session.get(User, user.id).password
+    assert upgraded.startswith(f"$2b${passwords.log_rounds:02d}$")
+    assert not passwords.needs_rehash(upgraded)
+    assert login(client, "secret").status_code == 200
+
+def test_hasher_runs_at_most_workers_hashes_at_once():
+    hasher = PasswordHasher(workers=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_hash(_):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    threads = [threading.Thread(target=hasher._submit, args=(slow_hash, None)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(peak) == 8
+    assert max(peak) == 2
+
+def test_login_answers_503_when_every_hash_slot_is_taken(client, user, monkeypatch):
+    hasher = PasswordHasher(workers=1)
+    monkeypatch.setattr(passwords, "hasher", hasher)
+    monkeypatch.setattr(passwords, "SLOT_WAIT_SECONDS", 0.01)
+    for _ in range(passwords.PENDING_PER_WORKER):
+        hasher._slots.acquire()
+
+    response = login(client, "secret")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    with pytest.raises(PasswordHasherBusy):
+        passwords.check_password(user.password, "secret")
@@ -0,0 +1,44 @@
+from applications.pricing import parse_bands, parse_daily_cap, parse_price
+import pytest
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", float("nan"), -1, "-0.5", "abc"])
+def test_parse_daily_cap_rejects_non_finite_and_negative(value):
+    with pytest.raises(ValueError):
+        parse_daily_cap(value)
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", float("inf"), -1, "abc", None])
+def test_parse_price_rejects_non_finite_and_negative(value):
+    with pytest.raises(ValueError):
+        parse_price(value)
+
+@pytest.mark.parametrize("value, expected", [(None, None), (0, 0.0), ("150", 150.0), (99.5, 99.5)])
+def test_parse_daily_cap(value, expected):
+    assert parse_daily_cap(value) == expected
+
+@pytest.mark.parametrize("price", ["nan", "inf"])
+def test_parse_bands_rejects_non_finite_price(price):
+    with pytest.raises(ValueError):
+        parse_bands([{"start": "08:00", "end": "10:00", "price": price}])
+
+def test_add_parking_lot_rejects_nan_daily_cap(client, admin_headers):
+    client.post("/add_location", headers=admin_headers,
+                json={"name": "Centre", "city": "City", "latitude": 12.9, "longitude": 77.6})
+    response = client.post("/add_parking_lot", headers=admin_headers, json={
+        "prime_location_name": "Lot A", "price": 20, "address": "Some street", "pin_code": "560001",
+        "number_of_spots": 2, "location_id": 1, "daily_cap": "nan",
+    })
+    assert response.status_code == 400
+    assert "daily_cap" in response.get_json()["message"]
+
+@pytest.mark.parametrize("price", ["nan", "inf", -5])
+def test_lot_price_must_be_finite_and_non_negative(client, admin_headers, price):
+    client.post("/add_location", headers=admin_headers,
+                json={"name": "Centre", "city": "City", "latitude": 12.9, "longitude": 77.6})
+    lot = {"prime_location_name": "Lot A", "price": 20, "address": "Some street", "pin_code": "560001",
+           "number_of_spots": 2, "location_id": 1}
+    assert client.post("/add_parking_lot", headers=admin_headers, json={**lot, "price": price}).status_code == 400
+
+    assert client.post("/add_parking_lot", headers=admin_headers, json=lot).status_code == 201
+    response = client.post("/update_parking_lot/1", headers=admin_headers, json={**lot, "price": price})
+    assert response.status_code == 400
+    assert "Price" in response.get_json()["message"]
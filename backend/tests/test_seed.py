@@ -0,0 +1,20 @@
+from applications import db
+from applications.models import ParkingLot, ParkingSpot, ReservedParking, User
+from tools.seed import seed_database
+
+SIZES = dict(locations=2, lots_per_location=2, spots_per_lot=5, reservations=30, echo=lambda message: None)
+
+def test_seed_without_users_never_assigns_reservations_to_admin(app):
+    seed_database(users=3, **{**SIZES, "reservations": 0})
+    seed_database(users=0, **SIZES)
+    admin_ids = db.session.execute(db.select(User.id).where(User.admin == True)).scalars().all()
+    owners = set(db.session.execute(db.select(ReservedParking.user_id).distinct()).scalars())
+    assert db.session.query(ReservedParking).count() == SIZES["reservations"]
+    assert owners and not owners & set(admin_ids)
+
+def test_seed_skips_reservations_when_there_are_no_users(app):
+    seed_database(users=0, **SIZES)
+    assert db.session.query(ReservedParking).count() == 0
+    # No reservation means no spot may be left occupied
+    assert db.session.query(ParkingSpot).filter(ParkingSpot.is_available == False).count() == 0
+    assert db.session.query(db.func.sum(ParkingLot.available_spots)).scalar() == 20
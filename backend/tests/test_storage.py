@@ -0,0 +1,49 @@
+from applications import app, db
+from applications.models import Location, ParkingLot, ParkingSpot
+from config import SQLITE_PROFILES, engine_options
+import pytest
+import sqlalchemy as sa
+
+SPOTS = 8
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """A pooled engine on a SQLite file, configured like a deployed app with the default profile."""
+    uri = f"sqlite:///{tmp_path / 'parking.db'}"
+    engine = sa.create_engine(uri, **engine_options(uri))
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sa.insert(Location.__table__).values(id=1, name="Centre", city="City", latitude=12.9, longitude=77.6))
+        conn.execute(sa.insert(ParkingLot.__table__).values(
+            id=1, prime_location_name="Lot A", price=10, address="Some street", pin_code="560001",
+            number_of_spots=SPOTS, available_spots=SPOTS, location_id=1))
+        conn.execute(sa.insert(ParkingSpot.__table__), [{"id": i + 1, "lot_id": 1} for i in range(SPOTS)])
+    yield engine
+    engine.dispose()
+
+def test_default_profile_applies_wal_pragmas(file_engine):
+    assert app.config["SQLITE_PRAGMAS"] is SQLITE_PROFILES["wal"]
+    with file_engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("busy_timeout") == SQLITE_PROFILES["wal"]["busy_timeout"]
+        assert pragma("foreign_keys") == 1
+
+def test_writes_commit_while_a_read_transaction_is_open(file_engine):
+    # With the rollback journal ("safe") the commit waits for the reader until busy_timeout
+    # and fails with "database is locked"; WAL lets it through and the reader keeps its snapshot
+    spot, lot = ParkingSpot.__table__, ParkingLot.__table__
+    free_spots = sa.select(lot.c.available_spots).where(lot.c.id == 1)
+    with file_engine.connect() as reader:
+        reader.exec_driver_sql("BEGIN")
+        assert reader.execute(free_spots).scalar() == SPOTS
+
+        with file_engine.begin() as writer:
+            writer.execute(sa.update(spot).where(spot.c.id == 1, spot.c.is_available == sa.true())
+                           .values(is_available=False))
+            writer.execute(sa.update(lot).where(lot.c.id == 1).values(available_spots=lot.c.available_spots - 1))
+
+        assert reader.execute(free_spots).scalar() == SPOTS
+        reader.exec_driver_sql("COMMIT")
+        assert reader.execute(free_spots).scalar() == SPOTS - 1
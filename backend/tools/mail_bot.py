@@ -1,15 +1,21 @@
 from flask_mail import Message, Mail
 from flask import current_app as app
+from collections import deque
+import smtplib
 
 mail = Mail()
 
+SENDER = 'noreply@parkpal.com'
+# Extra attempts per message inside one send_bulk call before it is handed back as failed
+MAX_SEND_RETRIES = 2
+# Failed connection attempts per send_bulk call before the whole batch is handed back as failed
+MAX_CONNECT_RETRIES = 2
+
 def init_app(app):
     mail.init_app(app)
 
-def send_email(to, subject, body=None, html=None, attachments=None):
-    sender = 'noreply@parkpal.com'
-    
-    msg = Message(subject, sender=sender, recipients=[to])
+def build_message(to, subject, body=None, html=None, attachments=None):
+    msg = Message(subject, sender=SENDER, recipients=[to])
     if body:
         msg.body = body
     if html:
@@ -26,6 +32,55 @@ def send_email(to, subject, body=None, html=None, attachments=None):
             else:
                 # Print a warning for malformed attachments (consider more robust logging in production)
                 print(f"Warning: Skipping malformed attachment: {attachment}. Missing 'filename', 'content_type', or 'data'.")
+    return msg
+
+def send_email(to, subject, body=None, html=None, attachments=None):
+    msg = build_message(to, subject, body=body, html=html, attachments=attachments)
     # Ensure this is called within a Flask application context
     with app.app_context():
-        mail.send(msg)
\ No newline at end of file
+        mail.send(msg)
+
+def send_bulk(emails, retries=MAX_SEND_RETRIES, connect_retries=MAX_CONNECT_RETRIES):
+    """
+    Send many emails over a single SMTP connection.
+    `emails` is a list of send_email keyword dicts. A message that fails is retried on a fresh
+    connection up to `retries` times. Failures to connect are not charged to any message: after
+    `connect_retries` extra attempts everything still queued is given up at once.
+    Returns (sent_count, failed_emails).
+    """
+    queue = deque(enumerate(emails))
+    attempts = {}
+    connect_failures = 0
+    failed = []
+    sent = 0
+    with app.app_context():
+        while queue:
+            connected = False
+            try:
+                with mail.connect() as conn:
+                    connected = True
+                    while queue:
+                        index, email = queue[0]
+                        conn.send(build_message(**email))
+                        queue.popleft()
+                        sent += 1
+            except (smtplib.SMTPException, OSError) as e:
+                if not connected:
+                    connect_failures += 1
+                    if connect_failures > connect_retries:
+                        # The server is most likely down; fail the batch fast instead of per message
+                        print(f"Warning: Giving up on {len(queue)} emails, cannot connect to SMTP server: {e}")
+                        failed.extend(email for _, email in queue)
+                        break
+                    continue
+                if not queue:
+                    # Everything went out, only closing the connection failed
+                    break
+                index, email = queue.popleft()
+                attempts[index] = attempts.get(index, 0) + 1
+                if attempts[index] <= retries:
+                    queue.appendleft((index, email))
+                else:
+                    print(f"Warning: Giving up on email to {email.get('to')}: {e}")
+                    failed.append(email)
+    return sent, failed
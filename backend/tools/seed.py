@@ -0,0 +1,168 @@
+from applications.models import *
+from applications.allocator import allocator
+from applications.passwords import hash_password
+from flask.cli import with_appcontext
+from faker import Faker # type: ignore
+from datetime import datetime, timedelta
+import click
+import random
+
+# Dataset sizes for `flask seed --scale ...`; "small" is the old dummy dataset used in development
+SCALES = {
+    "small": dict(users=5, locations=5, lots_per_location=2, spots_per_lot=10, reservations=20),
+    "medium": dict(users=10_000, locations=100, lots_per_location=10, spots_per_lot=100, reservations=1_000_000),
+    "large": dict(users=100_000, locations=1_000, lots_per_location=10, spots_per_lot=100, reservations=10_000_000),
+}
+
+DEFAULT_PASSWORD = "1234"
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+def _insert_batches(model, rows, batch_size):
+    """executemany INSERTs of `batch_size` rows, committed as one large transaction per table."""
+    table = model.__table__
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+def seed_database(users, locations, lots_per_location, spots_per_lot, reservations,
+                  occupancy=0.1, random_seed=42, batch_size=10_000, echo=print):
+    """
+    Generate a reproducible dataset for `random_seed` with bulk executemany inserts.
+    Spot and lot ids are assigned up front, so reservations never need to read anything back.
+    """
+    rng = random.Random(random_seed)
+    fake = Faker()
+    fake.seed_instance(random_seed)
+    now = datetime.now()
+
+    # bcrypt is deliberately slow; every seeded user shares one precomputed hash
+    password_hash = hash_password(DEFAULT_PASSWORD)
+
+    user_base = _next_id(User)
+    def user_rows():
+        for i in range(users):
+            username = f"{fake.user_name()}_{user_base + i}"
+            yield {
+                "id": user_base + i,
+                "name": fake.name(),
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": password_hash,
+                "admin": False,
+                "last_login": now - timedelta(hours=rng.randint(0, 24 * 60)),
+            }
+    echo(f"users: {_insert_batches(User, user_rows(), batch_size)}")
+
+    location_base = _next_id(Location)
+    def location_rows():
+        for i in range(locations):
+            yield {
+                "id": location_base + i,
+                "name": fake.street_name(),
+                "city": fake.city(),
+                "latitude": float(fake.latitude()),
+                "longitude": float(fake.longitude()),
+            }
+    echo(f"locations: {_insert_batches(Location, location_rows(), batch_size)}")
+
+    lot_count = locations * lots_per_location
+    lot_base = _next_id(ParkingLot)
+    prices = [round(rng.uniform(10, 50), 2) for _ in range(lot_count)]
+    def lot_rows():
+        for i in range(lot_count):
+            yield {
+                "id": lot_base + i,
+                "prime_location_name": f"{fake.company()} #{lot_base + i}",
+                "price": prices[i],
+                "address": fake.address(),
+                "pin_code": fake.postcode()[:6],
+                "number_of_spots": spots_per_lot,
+                "available_spots": spots_per_lot,
+                "location_id": location_base + i // lots_per_location,
+            }
+    echo(f"lots: {_insert_batches(ParkingLot, lot_rows(), batch_size)}")
+
+    # Reservations belong to the users seeded now, or with users=0 to the existing non-admin users
+    if users:
+        user_ids = range(user_base, user_base + users)
+    else:
+        user_ids = db.session.execute(
+            db.select(User.id).where(User.admin == False).order_by(User.id)
+        ).scalars().all()
+    if not user_ids:
+        echo("no non-admin users to own reservations, skipping them")
+        reservations = 0
+
+    # Spot ids are contiguous per lot, so a spot's lot is (spot_id - spot_base) // spots_per_lot
+    spot_count = lot_count * spots_per_lot
+    spot_base = _next_id(ParkingSpot)
+    occupied = set(rng.sample(range(spot_count), min(int(spot_count * occupancy), reservations, spot_count)))
+    def spot_rows():
+        for i in range(spot_count):
+            yield {
+                "id": spot_base + i,
+                "lot_id": lot_base + i // spots_per_lot,
+                "is_available": i not in occupied,
+            }
+    echo(f"spots: {_insert_batches(ParkingSpot, spot_rows(), batch_size)}")
+
+    def reservation_rows():
+        # One open reservation per occupied spot, the rest is released history
+        for i in sorted(occupied):
+            yield {
+                "user_id": rng.choice(user_ids),
+                "spot_id": spot_base + i,
+                "park_time": now - timedelta(minutes=rng.randint(5, 24 * 60)),
+                "exit_time": None,
+                "total_cost": None,
+            }
+        for _ in range(reservations - len(occupied)):
+            i = rng.randrange(spot_count)
+            park_time = now - timedelta(minutes=rng.randint(60, 365 * 24 * 60))
+            hours = rng.uniform(0.5, 12)
+            yield {
+                "user_id": rng.choice(user_ids),
+                "spot_id": spot_base + i,
+                "park_time": park_time,
+                "exit_time": park_time + timedelta(hours=hours),
+                "total_cost": round(prices[i // spots_per_lot] * hours, 2),
+            }
+    echo(f"reservations: {_insert_batches(ReservedParking, reservation_rows(), batch_size)}")
+
+    recount_available_spots()
+    allocator.forget()
+
+@click.command("seed")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="small", show_default=True,
+              help="Preset dataset size.")
+@click.option("--users", type=int, help="Override the number of users.")
+@click.option("--locations", type=int, help="Override the number of locations.")
+@click.option("--lots-per-location", type=int, help="Override lots per location.")
+@click.option("--spots-per-lot", type=int, help="Override spots per lot.")
+@click.option("--reservations", type=int, help="Override the number of reservations.")
+@click.option("--occupancy", type=float, default=0.1, show_default=True,
+              help="Fraction of spots left with an open reservation.")
+@click.option("--seed", "random_seed", type=int, default=42, show_default=True,
+              help="Random seed; the same seed gives the same dataset.")
+@click.option("--batch-size", type=int, default=10_000, show_default=True,
+              help="Rows per executemany INSERT.")
+@with_appcontext
+def seed_command(scale, occupancy, random_seed, batch_size, **overrides):
+    """Bulk-load a synthetic dataset for development or capacity testing."""
+    sizes = dict(SCALES[scale])
+    sizes.update({key: value for key, value in overrides.items() if value is not None})
+    click.echo(f"Seeding {scale} dataset: {sizes}")
+    seed_database(occupancy=occupancy, random_seed=random_seed, batch_size=batch_size, echo=click.echo, **sizes)
+    click.echo("✅ Dummy data seeded successfully.")
@@ -0,0 +1,27 @@
+from applications.pricing import recompute_costs, RECOMPUTE_BATCH_SIZE
+from applications.analytics import rebuild_usage
+from applications.cache_utils import invalidate
+from flask.cli import with_appcontext
+from datetime import timedelta
+import click
+
+@click.command("recompute-costs")
+@click.option("--day", type=click.DateTime(["%Y-%m-%d"]),
+              help="Settle one day: reservations that ended on this date.")
+@click.option("--since", type=click.DateTime(), help="Only reservations that ended at or after this time.")
+@click.option("--until", type=click.DateTime(), help="Only reservations that ended before this time.")
+@click.option("--lot-id", type=int, help="Only reservations in this lot.")
+@click.option("--batch-size", type=int, default=RECOMPUTE_BATCH_SIZE, show_default=True,
+              help="Rows priced and written per transaction.")
+@with_appcontext
+def recompute_costs_command(day, since, until, lot_id, batch_size):
+    """Reprice closed reservations with the lots' current tariffs."""
+    if day is not None:
+        since, until = day, day + timedelta(days=1)
+    count = recompute_costs(since=since, until=until, lot_id=lot_id, batch_size=batch_size, echo=click.echo)
+    # Revenue is bucketed by exit_time, the same range the costs were recomputed for
+    days = rebuild_usage(since=since, until=until)
+    click.echo(f"rebuilt {days} days of usage stats")
+    # Costs show up in the admin listings and in every user's reservation pages (keyed on "lots")
+    invalidate("reservations", "lots", "analytics")
+    click.echo(f"✅ Repriced {count} reservations.")
@@ -1,22 +1,81 @@
 from tools.workers import celery
 from applications.models import *
-from tools.mail_bot import send_email
+from tools.mail_bot import send_email, send_bulk
+from applications.instrumentation import count_queries
+from applications.outbox import dispatch_outbox
+from applications.analytics import rollup_usage, purge_hourly_usage
+from applications.occupancy import purge_fine_occupancy
+from applications.cache_utils import invalidate
 from flask import render_template
 from datetime import timedelta
 from celery.schedules import crontab
 import io
 import csv
+from itertools import groupby
+
+EMAIL_BATCH_SIZE = 100
+REMINDER_BATCH_SIZE = 500
+REMINDER_INTERVAL = timedelta(hours=24)
+MONTHLY_REPORT_PERIOD = timedelta(days=30)
+OUTBOX_RETENTION = timedelta(days=7)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
 
 @celery.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
+    # Both jobs are incremental, so frequent ticks only pick up what is due
     sender.add_periodic_task(10*60, send_daily_remainders.s(), name='send_daily_remainders')
     #sender.add_periodic_task(crontab(hour=10, minute=30), send_daily_remainders.s(), name='send_daily_remainders_at_10:30')
-    sender.add_periodic_task(10*60, send_monthly_reports.s(), name='send_monthly_reports')
+    sender.add_periodic_task(60*60, send_monthly_reports.s(), name='send_monthly_reports')
+    # Safety net for outbox messages the web process could not hand over (broker down, restarts)
+    sender.add_periodic_task(60, drain_outbox.s(), name='drain_outbox')
+    sender.add_periodic_task(60*60, purge_outbox.s(), name='purge_outbox')
+    # Picks up whole hours past the rollup watermark; most ticks find nothing to do
+    sender.add_periodic_task(10*60, rollup_usage_stats.s(), name='rollup_usage_stats')
+    sender.add_periodic_task(60*60, purge_occupancy.s(), name='purge_occupancy')
 
 @celery.task()
 def add(x, y):
     return x + y
 
+@celery.task()
+def drain_outbox():
+    sent = 0
+    while True:
+        batch = dispatch_outbox()
+        sent += batch
+        if batch == 0:
+            return sent
+
+@celery.task()
+def purge_outbox():
+    """Drop delivered outbox messages and expired idempotency keys."""
+    now = datetime.now()
+    messages = db.session.execute(
+        db.delete(OutboxMessage)
+        .where(OutboxMessage.dispatched_at != None, OutboxMessage.dispatched_at < now - OUTBOX_RETENTION)
+    ).rowcount
+    keys = db.session.execute(
+        db.delete(IdempotencyKey).where(IdempotencyKey.created_at < now - IDEMPOTENCY_KEY_TTL)
+    ).rowcount
+    db.session.commit()
+    return f"Purged {messages} outbox messages and {keys} idempotency keys"
+
+@celery.task()
+def rollup_usage_stats():
+    """Roll usage stats up to the last whole hour (catching up any backlog) and drop expired hourly rows."""
+    windows = 0
+    while rollup_usage():
+        windows += 1
+    purged = purge_hourly_usage()
+    if windows:
+        invalidate("analytics")
+    return f"Rolled up {windows} windows, purged {purged} hourly rows"
+
+@celery.task()
+def purge_occupancy():
+    """Drop 5-minute occupancy samples past their retention; hourly ones are kept."""
+    return f"Purged {purge_fine_occupancy()} occupancy samples"
+
 @celery.task()
 def send_reservation_email(reservation_id):
     try:
@@ -84,78 +143,189 @@ def send_release_email(reservation_id):
     send_email(to=to, subject=subject, html=html)
     return "Email sent successfully"
 
+@celery.task(bind=True, max_retries=3, default_retry_delay=60)
+def send_email_batch(self, emails):
+    """
+    Send one chunk of emails over a single SMTP connection.
+    Messages that still fail after the in-connection retries are retried later, on their own.
+    """
+    sent, failed = send_bulk(emails)
+    if failed:
+        raise self.retry(args=[failed])
+    return f"Sent {sent} emails"
+
+def fan_out_emails(emails, batch_size=EMAIL_BATCH_SIZE):
+    """
+    Split an iterable of send_email keyword dicts into chunks and queue one send_email_batch
+    subtask per chunk as soon as it fills, so the producer never holds every rendered email.
+    """
+    batches = 0
+    batch = []
+    for email in emails:
+        batch.append(email)
+        if len(batch) >= batch_size:
+            send_email_batch.delay(batch)
+            batches += 1
+            batch = []
+    if batch:
+        send_email_batch.delay(batch)
+        batches += 1
+    return batches
+
 @celery.task()
 def send_daily_remainders():
     """
-    Send daily remainders to all the users who haven't logged in since the last 24 hours
+    Send daily remainders to the users who haven't logged in since the last 24 hours
+    and haven't already been reminded in that time, in bounded batches
     """
-    day_ago = datetime.now() - timedelta(hours=24)
-    # Get all the users except admin who haven't logged in since the last 24 hours
-    users = User.query.filter_by(admin=False).filter(User.last_login < day_ago).all()
-    for user in users:
-        to = user.email
-        subject = "Daily Reminder"
-        html = render_template('daily_reminder.html', user_name=user.name, current_year=datetime.now().year)
-        send_email(to=to, subject=subject, html=html)
-    return "Email sent successfully"
+    now = datetime.now()
+    day_ago = now - REMINDER_INTERVAL
+    due = db.and_(
+        User.admin == False,
+        User.last_login < day_ago,
+        db.or_(User.last_reminded_at == None, User.last_reminded_at < day_ago)
+    )
+
+    reminded = 0
+    batches = 0
+    while True:
+        users = (
+            db.session.query(User.id, User.name, User.email)
+            .filter(due)
+            .order_by(User.last_login)
+            .limit(REMINDER_BATCH_SIZE)
+            .all()
+        )
+        if not users:
+            break
+
+        batches += fan_out_emails(
+            {
+                'to': email,
+                'subject': "Daily Reminder",
+                'html': render_template('daily_reminder.html', user_name=name, current_year=now.year)
+            }
+            for _, name, email in users
+        )
+        # Stamping the batch takes it out of `due`, so the loop always advances
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_([user_id for user_id, _, _ in users]))
+            .values(last_reminded_at=now)
+        )
+        db.session.commit()
+        reminded += len(users)
+
+    return f"Daily reminders queued for {reminded} users in {batches} batches"
+
+def claim_period(name, period, now):
+    """
+    Advance the watermark called `name` to `now` if at least `period` has passed since it was set.
+    Returns the previous watermark (None on the first run) or False if the period is not over yet.
+    The conditional UPDATE makes sure only one worker claims a given period.
+    """
+    watermark = TaskWatermark.query.get(name)
+    if watermark is None:
+        db.session.add(TaskWatermark(name, now))
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return False
+        return None
+
+    previous = watermark.value
+    if now - previous < period:
+        return False
+    claimed = db.session.execute(
+        db.update(TaskWatermark)
+        .where(TaskWatermark.name == name, TaskWatermark.value == previous)
+        .values(value=now)
+    ).rowcount
+    db.session.commit()
+    return previous if claimed else False
 
 @celery.task()
 def send_monthly_reports():
     today = datetime.now()
-    # Calculate the start date for the last 30 days
-    start_date = today - timedelta(days=30)
+    previous_run = claim_period('send_monthly_reports', MONTHLY_REPORT_PERIOD, today)
+    if previous_run is False:
+        return "Monthly reports already sent for this period"
+
+    # Report everything since the last run (the last 30 days on the first run)
+    start_date = previous_run or today - MONTHLY_REPORT_PERIOD
     end_date = today # End date is today
 
-    # Fetch all reservations within the last 30 days
-    # Ensure ReservedParking.park_time is a proper datetime column
-    past_month_reservations = ReservedParking.query.filter(
-        ReservedParking.park_time.between(start_date, end_date)
-    ).all()
-
-    # Group reservations by user
-    user_reservations = {}
-    for reservation in past_month_reservations:
-        user_id = reservation.user_id
-        if user_id not in user_reservations:
-            user_reservations[user_id] = []
-        user_reservations[user_id].append(reservation)
-
-    # Iterate through each user and send their report
-    for user_id, reservations in user_reservations.items():
-        user = User.query.get(user_id)
-        if user: # Ensure user exists before sending email
-            to = user.email
-            subject = f"Your Monthly Parking Report - {user.name} - ParkEase"
-
-            # 1. Generate HTML content for the email body
-            # Assuming 'monthly_report.html' is a Jinja2 template that displays reservation details
-            html_body = render_template(
-                'monthly_report.html',
-                user_name=user.name,
-                reservations=reservations, # Pass reservations to the HTML template as well
-                current_year=datetime.now().year
-            )
-
-            # 2. Generate CSV report data
-            csv_data_bytes = generate_monthly_csv_report(reservations)
-
-            # 3. Prepare the attachment list
-            attachments = [
+    with count_queries() as counter:
+        batches = fan_out_emails(iter_monthly_report_emails(start_date, end_date, today))
+
+    return f"Monthly reports queued in {batches} batches using {counter.count} queries"
+
+def iter_monthly_report_emails(start_date, end_date, today):
+    # One joined, user-ordered query for the whole run; groupby then sees each user's rows once
+    for (user_id, user_name, username, email), rows in groupby(
+        iter_monthly_report_rows(start_date, end_date), key=lambda row: row[:4]
+    ):
+        reservations = [row[4:] for row in rows]
+
+        # 1. Generate HTML content for the email body
+        html_body = render_template(
+            'monthly_report.html',
+            user_name=user_name,
+            reservations=reservations, # Pass reservations to the HTML template as well
+            current_year=datetime.now().year
+        )
+
+        # 2. Generate CSV report data
+        csv_data_bytes = generate_monthly_csv_report(reservations)
+
+        # 3. Prepare the email with HTML body and CSV attachment
+        yield {
+            'to': email,
+            'subject': f"Your Monthly Parking Report - {user_name} - ParkEase",
+            'html': html_body,
+            'attachments': [
                 {
-                    'filename': f'monthly_report_{user.username}_{today.strftime("%Y-%m")}.csv',
+                    'filename': f'monthly_report_{username}_{today.strftime("%Y-%m")}.csv',
                     'content_type': 'text/csv',
                     'data': csv_data_bytes
                 }
             ]
+        }
 
-            # 4. Send the email with HTML body and CSV attachment
-            send_email(to=to, subject=subject, html=html_body, attachments=attachments)
-        else:
-            print(f"Warning: User with ID {user_id} not found for sending monthly report.")
-
-    return "Monthly reports sent successfully"
+def iter_monthly_report_rows(start_date, end_date):
+    """
+    Yield (user_id, name, username, email, reservation_id, spot_id, lot_name, park_time, exit_time, total_cost)
+    for every reservation parked in [start_date, end_date], ordered by user, streamed in batches.
+    """
+    statement = (
+        db.select(
+            User.id,
+            User.name,
+            User.username,
+            User.email,
+            ReservedParking.id,
+            ReservedParking.spot_id,
+            ParkingLot.prime_location_name,
+            ReservedParking.park_time,
+            ReservedParking.exit_time,
+            ReservedParking.total_cost,
+        )
+        .join(User, User.id == ReservedParking.user_id)
+        .outerjoin(ParkingSpot, ParkingSpot.id == ReservedParking.spot_id)
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .where(ReservedParking.park_time.between(start_date, end_date))
+        .order_by(ReservedParking.user_id, ReservedParking.park_time)
+        .execution_options(yield_per=1000, stream_results=True)
+    )
+    for row in db.session.execute(statement):
+        yield tuple(row)
 
 def generate_monthly_csv_report(reservations):
+    """
+    reservations: (reservation_id, spot_id, lot_name, park_time, exit_time, total_cost) rows,
+    with the lot name already resolved by the report query.
+    """
     output = io.StringIO()
     writer = csv.writer(output)
 
@@ -166,18 +336,14 @@ def generate_monthly_csv_report(reservations):
     ])
 
     # Write data for each reservation
-    for res in reservations:
-        # Fetch related spot and lot details for the report
-        spot = ParkingSpot.query.get(res.spot_id)
-        lot_name = ParkingLot.query.get(spot.lot_id).prime_location_name if spot and spot.lot_id else 'N/A'
-
+    for res_id, spot_id, lot_name, park_time, exit_time, total_cost in reservations:
         writer.writerow([
-            res.id,
-            res.spot_id,
-            lot_name,
-            res.park_time.strftime('%Y-%m-%d %H:%M:%S') if res.park_time else 'N/A',
-            res.exit_time.strftime('%Y-%m-%d %H:%M:%S') if res.exit_time else 'N/A',
-            f"{res.total_cost:.2f}" if res.total_cost is not None else 'N/A'
+            res_id,
+            spot_id,
+            lot_name or 'N/A',
+            park_time.strftime('%Y-%m-%d %H:%M:%S') if park_time else 'N/A',
+            exit_time.strftime('%Y-%m-%d %H:%M:%S') if exit_time else 'N/A',
+            f"{total_cost:.2f}" if total_cost is not None else 'N/A'
         ])
 
     # Get the string value and encode it to bytes
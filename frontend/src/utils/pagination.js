@@ -0,0 +1,36 @@
+// Largest page the listing endpoints serve (MAX_PAGE_SIZE in backend/applications/pagination.py)
+const PAGE_SIZE = 5000;
+
+// Fetch every page of a keyset-paginated listing (/get_lots, /parking_lots, /get_users, ...).
+// `lists` maps each response key to its cursor name, e.g. { reservedSpots: 'reservations' }.
+// The server pages all lists of an endpoint in one response, so later requests carry a
+// <name>_cursor for each list that is still incomplete and ignore the rows of the others.
+// Resolves to { ok, status, data }; data holds the merged lists, or the error body of a failed page.
+export async function fetchAllPages(url, lists, options = {}) {
+    let merged = null;
+    let pending = Object.keys(lists);
+    let cursors = {};
+    for (;;) {
+        const query = new URLSearchParams({ limit: PAGE_SIZE, ...cursors });
+        const response = await fetch(`${url}?${query}`, options);
+        const data = await response.json();
+        if (!response.ok) {
+            return { ok: false, status: response.status, data };
+        }
+
+        if (merged === null) {
+            merged = data;
+        } else {
+            for (const key of pending) {
+                merged[key] = merged[key].concat(data[key]);
+            }
+        }
+
+        const next = data.next_cursors || {};
+        pending = pending.filter(key => next[lists[key]]);
+        if (pending.length === 0) {
+            return { ok: true, status: response.status, data: merged };
+        }
+        cursors = Object.fromEntries(pending.map(key => [`${lists[key]}_cursor`, next[lists[key]]]));
+    }
+}